@@ -1,20 +1,126 @@
-from flask import Flask, request, jsonify, render_template
-from flask_cors import CORS
+from flask import Flask, Response, request, jsonify
+import math
 import requests
 import os
+import threading
+
+from assets import IMMUTABLE_CACHE, PageCache, init_assets, init_images
+from batch_jobs import BATCH_MAX_ITEMS, BATCH_PARALLEL, BatchJobStore
+from chat_history import PROMPT_TOKEN_BUDGET, HistorySummarizer, build_prompt, count_tokens, fits_in_context
+from chat_sessions import ChatSessionStore
+from circuit_breaker import CircuitOpenError
+from compression import CompressionMiddleware
+from cors import CorsMiddleware
+from deadline import DEADLINE_HEADER, MAX_DEADLINE_SECONDS, Deadline, DeadlineExceeded
+from disconnect import DisconnectWatch
+from hedging import HedgePolicy
+from json_codec import dumps, init_json
+from llm_client import EMBED_MODEL, GenerationCancelled, collect_generation
+import metrics
+from notes_index import ALLOWED_EXTENSIONS, NotesIndex
+from ollama_pool import OllamaPool
+import prompts
+from parsing import complete_lines, format_flashcards, format_quiz, parse_flashcards, parse_quiz
+from scheduler import BATCH, SPECULATIVE, GenerationScheduler, SpeculativeCache, normalize_topic
+from store import ANKI_PREAMBLE, Store, anki_rows, stream_delimited
 
 app = Flask(__name__)
-CORS(app)
+init_json(app)
+init_assets(app)
+init_images(app)
+pages = PageCache(app)
+# Outermost first: CORS answers preflights before anything else runs
+app.wsgi_app = CorsMiddleware(CompressionMiddleware(app.wsgi_app))
+
+chat_sessions = ChatSessionStore()
+scheduler = GenerationScheduler()
+speculative = SpeculativeCache()
+batch_jobs = BatchJobStore()
+# Ollama servers from OLLAMA_HOSTS (or the single OLLAMA_HOST)
+pool = OllamaPool()
+# Opt-in: duplicate chat generations whose first token is slower than the recent p95
+chat_hedge = HedgePolicy('chat') if os.getenv("CHAT_HEDGING", "off") == "on" else None
+
+# Uploaded notes, indexes and other runtime data live here
+DATA_DIR = os.getenv("SMARTPREP_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+NOTES_TOP_K = int(os.getenv("NOTES_TOP_K", "4"))
+
+# Semantic retrieval over notes: "ollama" (/api/embed on the OLLAMA_HOSTS pool), "hash" (local stand-in) or "off"
+NOTES_EMBEDDINGS = os.getenv("NOTES_EMBEDDINGS", "off")
+NOTES_EMBED_DIM = int(os.getenv("NOTES_EMBED_DIM", "256" if NOTES_EMBEDDINGS == "hash" else "768"))
+
+store = Store(os.path.join(DATA_DIR, "smartprep.db"))
+notes = NotesIndex(os.path.join(DATA_DIR, "notes.db"))
+notes_vectors = None
+embedder = None
+if NOTES_EMBEDDINGS != "off":
+    # NumPy-backed, so only imported when enabled: it's the bulk of a worker's import time
+    from embedding_service import EmbeddingService
+    from embedding_store import EmbeddingStore, hashed_embedding
+
+    notes_vectors = EmbeddingStore(os.path.join(DATA_DIR, "notes_vectors"), NOTES_EMBED_DIM,
+                                   os.getenv("NOTES_EMBED_DTYPE", "float32"))
+    if NOTES_EMBEDDINGS == "hash":
+        embedder = EmbeddingService(lambda texts: [hashed_embedding(t, NOTES_EMBED_DIM) for t in texts],
+                                    os.path.join(DATA_DIR, "embeddings_cache.db"), model="hash")
+    else:
+        embedder = EmbeddingService(pool.embed,
+                                    os.path.join(DATA_DIR, "embeddings_cache.db"), model=EMBED_MODEL)
 
-# Get host from ENV (works better) — fallback to localhost
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+def embed_text(text):
+    return embedder.embed(text)
+
+def embed_document(doc_id):
+    chunks = notes.document_chunks(doc_id)
+    vectors = embedder.embed_many([text for _, text in chunks])
+    notes_vectors.append([str(chunk_id) for chunk_id, _ in chunks], vectors)
+
+def notes_context(query):
+    # Top-k chunks of the student's own notes that match the query ('' if none)
+    ranked = [chunk_id for chunk_id, _ in notes.search(query, NOTES_TOP_K)]
+    if notes_vectors is not None and len(notes):
+        try:
+            semantic = [int(i) for i, score in notes_vectors.search(embed_text(query), NOTES_TOP_K) if score > 0]
+        except Exception:
+            semantic = []
+        # Reciprocal rank fusion of keyword and semantic hits
+        fused = {}
+        for hits in (ranked, semantic):
+            for rank, chunk_id in enumerate(hits):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (60 + rank)
+        ranked = sorted(fused, key=fused.get, reverse=True)[:NOTES_TOP_K]
+    return "\n---\n".join(notes.chunk_texts(ranked))
+
+def after_fork():
+    # Called in each worker forked from a preloaded master (see serve.py)
+    store.reopen()
+    notes.reopen()
+    if embedder is not None:
+        embedder.reopen()
 
 def check_ollama():
-    try:
-        response = requests.get(f'{OLLAMA_HOST}/api/tags', timeout=3)
-        return response.status_code == 200
-    except:
-        return False
+    # Hosts known to be down (circuit open) aren't asked again
+    return pool.check(timeout=3)
+
+def summarize_history(summary, turns):
+    payload = {'model': 'phi3:mini', **prompts.render('summary', summary=summary or "none", turns=turns)}
+    text, _ = collect_generation(pool.stream_generate(payload, estimated_tokens('summary', payload),
+                                                      route='summary', timeout=60))
+    return text
+
+summarizer = HistorySummarizer(summarize_history)
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_view():
+    data = metrics.snapshot()
+    data['gauges'].update({
+        'scheduler_queued': scheduler.queued(),
+        'speculative_hit_rate': metrics.get("speculative_hits") / max(
+            1, metrics.get("speculative_hits") + metrics.get("speculative_misses")),
+        'pool_affinity_hit_rate': pool.affinity_hit_rate(),
+    })
+    data['gauges'].update({f'chat_{name}': value for name, value in chat_sessions.stats().items()})
+    return jsonify(data)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -24,6 +130,151 @@ def health_check():
     })
 
 
+def deck_payload(kind, topic):
+    # Static instructions go first (as `system`) so Ollama can reuse them across topics
+    notes_block = prompts.notes_section(notes_context(topic))
+    return {'model': 'phi3:mini', **prompts.render(kind, topic=topic, notes=notes_block)}
+
+def speculate_quiz(topic):
+    """
+    Students almost always open the quiz tab right after flashcards, so queue the
+    same-topic quiz at low priority and park it for the next /api/generate_quiz.
+    """
+    key = ('quiz', normalize_topic(topic))
+    if speculative.has(key) or scheduler.pending(key) is not None or not pool.available():
+        return
+
+    def job(j):
+        payload = deck_payload('quiz', topic)
+        try:
+            text, _ = collect_generation(pool.stream_generate(
+                payload, estimated_tokens('quiz', payload), affinity=normalize_topic(topic), route='speculative',
+                timeout=j.timeout(50), should_stop=j.cancel_event.is_set))
+        except GenerationCancelled as e:
+            # An interactive request needed the model
+            metrics.inc("speculative_wasted", reason="cancelled")
+            metrics.inc("speculative_wasted_tokens", e.tokens)
+            raise
+        except Exception:
+            metrics.inc("speculative_wasted", reason="failed")
+            raise
+        speculative.put(key, text)
+        metrics.inc("speculative_completed")
+        return text
+
+    if not scheduler.submit(job, SPECULATIVE, key).cancelled():
+        metrics.inc("speculative_issued")
+
+def take_speculative_quiz(topic, deadline):
+    # A parked quiz, or one still being generated for this topic (we wait for it).
+    # The queued job may be a batch item rather than speculation; its text is used all the same.
+    key = ('quiz', normalize_topic(topic))
+    text = speculative.take(key)
+    speculated = text is not None
+    if text is None:
+        future = scheduler.promote(key, deadline=deadline)
+        if future is not None:
+            try:
+                text = future.result(timeout=deadline.timeout())
+            except Exception:
+                text = None
+            else:
+                # A speculative job also parked it; take it so it isn't served again
+                speculated = speculative.take(key) is not None
+    metrics.inc("speculative_hits" if speculated else "speculative_misses")
+    return text
+
+
+# Typical completion length per route, to estimate what an abort saved
+_typical_tokens = {}
+DEFAULT_COMPLETION_TOKENS = 200
+
+def record_cancelled(route, tokens):
+    metrics.inc("generation_cancelled", route=route)
+    metrics.inc("generation_cancelled_tokens", tokens, route=route)
+    metrics.inc("generation_tokens_saved", max(0, round(_typical_tokens.get(route, 0)) - tokens), route=route)
+
+def estimated_tokens(route, payload):
+    # Work a generation adds to its host, for load balancing: prompt (≈4 chars a token) plus a typical answer
+    prompt_chars = len(payload.get('system', '')) + len(payload.get('prompt', ''))
+    return prompt_chars // 4 + round(_typical_tokens.get(route, DEFAULT_COMPLETION_TOKENS))
+
+def record_completed(route, final):
+    # Ollama's own timings: prompt tokens it had to evaluate (not served from its cache) and how long that took
+    metrics.inc("prompt_eval_tokens", final.get('prompt_eval_count', 0), route=route)
+    metrics.inc("prompt_eval_seconds", final.get('prompt_eval_duration', 0) / 1e9, route=route)
+    count = final.get('eval_count')
+    if count:
+        typical = _typical_tokens.get(route)
+        _typical_tokens[route] = count if typical is None else 0.9 * typical + 0.1 * count
+
+def generate(route, payload, deadline, affinity=None, hedge=None):
+    """
+    Run a generation for the current request, streamed from Ollama so it can be
+    abandoned: if the client disconnects, the upstream connection is closed,
+    which stops the model and frees it for queued work. `affinity` (a session
+    ID or normalized topic) keeps related generations on the same host;
+    `hedge` is an optional HedgePolicy.
+    Returns (text, final_chunk). Raises GenerationCancelled on disconnect and
+    DeadlineExceeded (carrying the text so far) once the deadline passes.
+    """
+    watch = DisconnectWatch(request.environ)
+    pieces = []
+    final = {}
+    try:
+        for chunk in pool.stream_generate(payload, estimated_tokens(route, payload), affinity, hedge, route,
+                                          timeout=deadline.timeout(),
+                                          should_stop=lambda: deadline.expired() or watch()):
+            pieces.append(chunk.get('response', ''))
+            if chunk.get('done'):
+                final = chunk
+    except GenerationCancelled as e:
+        if watch.disconnected:
+            record_cancelled(route, e.tokens)
+            raise
+        metrics.inc("deadline_exceeded", route=route)
+        raise DeadlineExceeded("".join(pieces), e.tokens)
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+        # The read timeout is the deadline, so Ollama went quiet past it
+        if not deadline.expired():
+            raise
+        metrics.inc("deadline_exceeded", route=route)
+        raise DeadlineExceeded("".join(pieces), len(pieces))
+    record_completed(route, final)
+    return "".join(pieces), final
+
+def ollama_unavailable(kind=None, topic=None, retry_after=None):
+    """
+    Answer for when Ollama is down or its circuit is open: the last deck of this
+    kind saved for the topic, if any (marked `cached`), else a 503 that tells
+    clients when to try again.
+    """
+    if kind is not None:
+        deck = store.latest_deck(kind, topic)
+        if deck is not None:
+            metrics.inc("circuit_fallback", route=kind)
+            return jsonify({'success': True, 'cached': True, f'{kind}_text': deck['text'], 'deck_id': deck['id']})
+    response = jsonify({'success': False, 'error': 'Ollama not running'})
+    response.status_code = 503
+    retry_after = pool.retry_after() if retry_after is None else retry_after
+    if retry_after > 0:
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+def model_error(e):
+    # Ollama answered 503 (busy or loading the model) even after retries: say when to come back
+    if e.response is not None and e.response.status_code == 503:
+        response = jsonify({'success': False, 'error': 'Model is busy, try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
+    return jsonify({'success': False, 'error': 'Model error'}), 500
+
+def disconnected_response():
+    # Nobody is listening any more; 499 is what nginx logs for this
+    return jsonify({'success': False, 'error': 'Client disconnected'}), 499
+
+
 # ------ FLASHCARDS ------
 @app.route('/api/generate_flashcards', methods=['POST'])
 def generate_flashcards():
@@ -33,26 +284,30 @@ def generate_flashcards():
             return jsonify({'success': False, 'error': 'Topic is required'}), 400
         
         if not check_ollama():
-            return jsonify({'success': False, 'error': 'Ollama not running'}), 503
+            return ollama_unavailable('flashcards', topic)
 
-        prompt = f"""
-Generate exactly 5 flashcards about {topic}.
-Format strictly:
-Q: question
-A: answer (1–2 lines)
-"""
+        payload = deck_payload('flashcards', topic)
 
-        response = requests.post(
-            f'{OLLAMA_HOST}/api/generate',
-            json={'model': 'phi3:mini', 'prompt': prompt, 'stream': False},
-            timeout=50
-        )
+        deadline = Deadline.from_headers(request.headers, default=50)
+        with scheduler.interactive(('flashcards', normalize_topic(topic))):
+            text, _ = generate('flashcards', payload, deadline, normalize_topic(topic))
 
-        if response.status_code == 200:
-            return jsonify({'success': True, 'flashcards_text': response.json().get('response', '')})
-
-        return jsonify({'success': False, 'error': 'Model error'}), 500
+        deck_id = store.save_deck('flashcards', topic, text)
+        speculate_quiz(topic)
+        return jsonify({'success': True, 'flashcards_text': text, 'deck_id': deck_id})
 
+    except DeadlineExceeded as e:
+        # Keep the cards that were finished in time; partial decks aren't saved
+        cards = parse_flashcards(complete_lines(e.text))
+        if not cards:
+            return jsonify({'success': False, 'error': 'AI timeout, retry topic'}), 408
+        return jsonify({'success': True, 'partial': True, 'flashcards_text': format_flashcards(cards)})
+    except CircuitOpenError as e:
+        return ollama_unavailable('flashcards', topic, e.retry_after)
+    except GenerationCancelled:
+        return disconnected_response()
+    except requests.HTTPError as e:
+        return model_error(e)
     except requests.exceptions.Timeout:
         return jsonify({'success': False, 'error': 'AI timeout, retry topic'}), 408
     except Exception as e:
@@ -66,86 +321,461 @@ def generate_quiz():
         topic = request.json.get('topic', '').strip()
         if not topic:
             return jsonify({'success': False, 'error': 'Topic is required'}), 400
-        
-        if not check_ollama():
-            return jsonify({'success': False, 'error': 'Ollama not running'}), 503
-
-        prompt = f"""
-Make 3 MCQ questions on {topic}.
-Format:
-Q:
-A) 
-B) 
-C) 
-D)
-ANSWER: letter
-"""
-
-        response = requests.post(
-            f'{OLLAMA_HOST}/api/generate',
-            json={'model': 'phi3:mini', 'prompt': prompt, 'stream': False},
-            timeout=50
-        )
-
-        if response.status_code == 200:
-            return jsonify({'success': True, 'quiz_text': response.json().get('response', '')})
-
-        return jsonify({'success': False, 'error': 'Model error'}), 500
 
+        deadline = Deadline.from_headers(request.headers, default=50)
+        with scheduler.interactive(('quiz', normalize_topic(topic))):
+            text = take_speculative_quiz(topic, deadline)
+            if text is not None:
+                deck_id = store.save_deck('quiz', topic, text)
+                return jsonify({'success': True, 'quiz_text': text, 'deck_id': deck_id})
+
+            if not check_ollama():
+                return ollama_unavailable('quiz', topic)
+
+            text, _ = generate('quiz', deck_payload('quiz', topic), deadline, normalize_topic(topic))
+
+        deck_id = store.save_deck('quiz', topic, text)
+        return jsonify({'success': True, 'quiz_text': text, 'deck_id': deck_id})
+
+    except DeadlineExceeded as e:
+        questions = parse_quiz(complete_lines(e.text), require_answer=True)
+        if not questions:
+            return jsonify({'success': False, 'error': 'AI timeout'}), 408
+        return jsonify({'success': True, 'partial': True, 'quiz_text': format_quiz(questions)})
+    except CircuitOpenError as e:
+        return ollama_unavailable('quiz', topic, e.retry_after)
+    except GenerationCancelled:
+        return disconnected_response()
+    except requests.HTTPError as e:
+        return model_error(e)
     except requests.exceptions.Timeout:
         return jsonify({'success': False, 'error': 'AI timeout'}), 408
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ------ BATCH ------
+DECK_KINDS = ('flashcards', 'quiz')
+BATCH_ITEM_TIMEOUT = 50
+
+def cached_deck(kind, topic):
+    # (deck_id, text) of a quiz generated speculatively and not served yet, else of the last saved deck.
+    # Taken here, a speculative quiz is a cached batch item rather than a speculative hit.
+    if kind == 'quiz':
+        text = speculative.take(('quiz', normalize_topic(topic)))
+        if text is not None:
+            return store.save_deck(kind, topic, text), text
+    deck = store.latest_deck(kind, topic)
+    return (deck['id'], deck['text']) if deck is not None else None
+
+def batch_generation(kind, topic):
+    def job(j):
+        payload = deck_payload(kind, topic)
+        text, final = collect_generation(pool.stream_generate(
+            payload, estimated_tokens(kind, payload), affinity=normalize_topic(topic), route='batch',
+            timeout=j.timeout(BATCH_ITEM_TIMEOUT), should_stop=j.cancel_event.is_set))
+        record_completed(kind, final)
+        return text
+    return job
+
+def batch_item_error(e):
+    if isinstance(e, CircuitOpenError):
+        return 'Ollama not running'
+    if isinstance(e, requests.HTTPError):
+        busy = e.response is not None and e.response.status_code == 503
+        return 'Model is busy, try again shortly' if busy else 'Model error'
+    if isinstance(e, requests.exceptions.Timeout):
+        return 'AI timeout, retry topic'
+    if isinstance(e, DeadlineExceeded):
+        return 'Deadline passed before this topic was generated'
+    return str(e) or 'Generation failed'
+
+def start_batch(job, deadline=None):
+    """
+    Answer cached items right away and queue the rest at BATCH priority, at most
+    BATCH_PARALLEL of this job's items at a time. A topic already queued (e.g. a
+    speculative quiz) is promoted and shared rather than generated twice.
+    Items still queued when `deadline` passes fail without being generated.
+    """
+    pending = []
+    for index, (kind, topic) in enumerate(job.items):
+        cached = cached_deck(kind, topic)
+        if cached is None:
+            pending.append((index, kind, topic))
+            continue
+        metrics.inc("batch_items", result="cached")
+        deck_id, text = cached
+        job.add_result({'index': index, 'kind': kind, 'topic': topic, 'success': True, 'cached': True,
+                        'deck_id': deck_id, f'{kind}_text': text})
+    pending = iter(pending)
+    lock = threading.Lock()
+
+    def submit_next():
+        with lock:
+            item = next(pending, None)
+        if item is None:
+            return
+        index, kind, topic = item
+        key = (kind, normalize_topic(topic))
+        future = scheduler.promote(key, BATCH, deadline)
+        claimed = future is not None
+        if not claimed:
+            future = scheduler.submit(batch_generation(kind, topic), BATCH, key, deadline)
+        future.add_done_callback(lambda f: finish(index, kind, topic, f, key if claimed else None))
+
+    def finish(index, kind, topic, future, claimed_key):
+        # Runs on a scheduler worker, which then starts this job's next item
+        try:
+            text = future.result()
+            if claimed_key is not None:
+                # A speculative job also parks its result; this batch has it now, so nobody is served it twice
+                speculative.take(claimed_key)
+            result = {'index': index, 'kind': kind, 'topic': topic, 'success': True,
+                      'deck_id': store.save_deck(kind, topic, text), f'{kind}_text': text}
+            metrics.inc("batch_items", result="generated")
+        except Exception as e:
+            result = {'index': index, 'kind': kind, 'topic': topic, 'success': False, 'error': batch_item_error(e)}
+            metrics.inc("batch_items", result="failed")
+        job.add_result(result)
+        submit_next()
+
+    for _ in range(BATCH_PARALLEL):
+        submit_next()
+
+def batch_stream(job, offset=0):
+    # NDJSON: a header line, one line per result from `offset` on as it finishes, then a summary
+    def lines():
+        yield dumps({'job_id': job.id, 'total': len(job.items)}) + b"\n"
+        for result in job.follow(offset):
+            yield dumps(result) + b"\n"
+        succeeded = sum(1 for r in job.results if r['success'])
+        yield dumps({'done': True, 'job_id': job.id, 'succeeded': succeeded,
+                     'failed': len(job.results) - succeeded}) + b"\n"
+
+    return Response(lines(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/batch/generate', methods=['POST'])
+def batch_generate():
+    """
+    Decks for a list of topics: {"topics": [...], "kinds": ["flashcards", "quiz"]}.
+    Each topic × kind is an item, generated in the background through the
+    scheduler; the response streams results in the order they finish, each
+    with its `index` in the item list. The stream can be picked up again with
+    GET /api/batch/<job_id>?offset=<results already received>. There is no
+    deadline for the whole batch unless the client sends X-Deadline-Ms.
+    """
+    body = request.json or {}
+    topics = body.get('topics')
+    kinds = body.get('kinds') or ['flashcards']
+    if not isinstance(topics, list) or not all(isinstance(t, str) for t in topics):
+        return jsonify({'success': False, 'error': 'Topics must be a list of strings'}), 400
+    if not isinstance(kinds, list) or not kinds or any(k not in DECK_KINDS for k in kinds):
+        return jsonify({'success': False, 'error': 'Kinds must be flashcards and/or quiz'}), 400
+
+    items, seen = [], set()
+    for topic in (t.strip() for t in topics):
+        for kind in kinds:
+            if topic and (kind, normalize_topic(topic)) not in seen:
+                seen.add((kind, normalize_topic(topic)))
+                items.append((kind, topic))
+    if not items:
+        return jsonify({'success': False, 'error': 'Topics are required'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'success': False, 'error': f'At most {BATCH_MAX_ITEMS} items per batch'}), 400
+
+    job = batch_jobs.create(items)
+    start_batch(job, Deadline.from_headers(request.headers, MAX_DEADLINE_SECONDS)
+                if request.headers.get(DEADLINE_HEADER) else None)
+    return batch_stream(job)
+
+@app.route('/api/batch/<job_id>', methods=['GET'])
+def resume_batch(job_id):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Batch job not found'}), 404
+    return batch_stream(job, max(0, request.args.get('offset', 0, type=int)))
+
+
+# ------ DECKS ------
+@app.route('/api/decks/<deck_id>', methods=['GET'])
+def get_deck(deck_id):
+    # Deck IDs are content hashes, so the ID itself is a strong validator and what
+    # this URL returns never changes: revalidation needs no database read, and
+    # browsers or a reverse proxy may keep the response indefinitely.
+    # (Weak comparison, since compressed responses carry a weak ETag.)
+    if request.if_none_match.contains_weak(deck_id):
+        response = Response(status=304)
+    else:
+        deck = store.get_deck(deck_id)
+        if deck is None:
+            return jsonify({'success': False, 'error': 'Deck not found'}), 404
+        text_key = 'quiz_text' if deck['kind'] == 'quiz' else 'flashcards_text'
+        response = jsonify({'success': True, 'deck_id': deck_id, 'kind': deck['kind'],
+                            'topic': deck['topic'], text_key: deck['text']})
+    response.set_etag(deck_id)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    return response
+
+
 # ------ CHAT ------
+def chat_payload(session, msg, context):
+    # Ground the answer in matching chunks of uploaded notes rather than whole documents
+    material = notes_context(msg)
+    if material:
+        context = f"{material}\n---\n{context}" if context else material
+
+    # Follow-up turns reuse Ollama's context tokens, so only the new question is sent.
+    # Once that context would blow the token budget, rebuild a compact prompt
+    # from the rolling summary plus the last few turns instead.
+    follow_up = prompts.render('chat_followup', question=msg, context=prompts.context_section(context))
+    payload = {'model': 'phi3:mini'}
+    if fits_in_context(len(session.context), " ".join(follow_up.values())):
+        payload.update(follow_up)
+        payload['context'] = session.context
+    else:
+        template = prompts.get_template('chat')
+        # The template's own text counts against the budget too
+        overhead = count_tokens(" ".join(template.render(conversation="").values()))
+        conversation = build_prompt(session.history, "", msg, context, budget=PROMPT_TOKEN_BUDGET - overhead)
+        payload.update(template.render(conversation=conversation))
+    return payload
+
+def finish_chat_turn(session, msg, text, final):
+    text = text.replace("ANSWER:", "").strip()
+    chat_sessions.update_context(session, final.get('context'))
+    session.history.add_turn(msg, text)
+    summarizer.schedule(session.history)
+    return text
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
         msg = request.json.get('message', '').strip()
-        context = request.json.get('context', '')
         if not msg:
             return jsonify({'success': False, 'error': 'Message required'}), 400
         
         if not check_ollama():
-            return jsonify({'success': False, 'error': 'Ollama not running'}), 503
-
-        prompt = f"""
-Answer clearly in ≤100 words.
-Question: {msg}
-{"Context: " + context if context else ""}
-"""
-
-        response = requests.post(
-            f'{OLLAMA_HOST}/api/generate',
-            json={'model': 'phi3:mini', 'prompt': prompt, 'stream': False},
-            timeout=40
-        )
+            return ollama_unavailable()
 
-        if response.status_code == 200:
-            text = response.json().get('response', '').replace("ANSWER:", "").strip()
-            return jsonify({'success': True, 'response': text})
+        session = chat_sessions.get_or_create(request.json.get('session_id'))
+        deadline = Deadline.from_headers(request.headers, default=40)
+        partial = False
+        with summarizer.interactive(), scheduler.interactive(('chat', session.id)):
+            payload = chat_payload(session, msg, request.json.get('context', ''))
+            try:
+                text, final = generate('chat', payload, deadline, session.id, chat_hedge)
+            except DeadlineExceeded as e:
+                if not e.text.strip():
+                    raise requests.exceptions.Timeout()
+                # A cut-off answer beats none; without Ollama's context the next turn rebuilds the prompt
+                text, final, partial = e.text, {}, True
 
-        return jsonify({'success': False, 'error': 'Model error'}), 500
+        text = finish_chat_turn(session, msg, text, final)
+        response = {'success': True, 'response': text, 'session_id': session.id}
+        if partial:
+            response['partial'] = True
+        return jsonify(response)
 
+    except CircuitOpenError as e:
+        return ollama_unavailable(retry_after=e.retry_after)
+    except GenerationCancelled:
+        return disconnected_response()
+    except requests.HTTPError as e:
+        return model_error(e)
     except requests.exceptions.Timeout:
         return jsonify({'success': False, 'error': 'AI timeout, try again'}), 408
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def sse_event(data, event=None):
+    head = f"event: {event}\n" if event else ""
+    return head.encode() + b"data: " + dumps(data) + b"\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    /api/chat as Server-Sent Events: one `data: {"token": ...}` event per token,
+    then a `done` event with the full answer and session_id (or an `error` event).
+    When the client goes away the server closes this stream, which closes the
+    upstream request and stops the generation.
+    """
+    msg = (request.json or {}).get('message', '').strip()
+    if not msg:
+        return jsonify({'success': False, 'error': 'Message required'}), 400
+    if not pool.available():
+        return ollama_unavailable()
+    session = chat_sessions.get_or_create(request.json.get('session_id'))
+    context = request.json.get('context', '')
+    deadline = Deadline.from_headers(request.headers, default=40)
+
+    def events():
+        pieces = []
+        chunks = None
+        try:
+            final = {}
+            with summarizer.interactive(), scheduler.interactive(('chat', session.id)):
+                payload = chat_payload(session, msg, context)
+                chunks = pool.stream_generate(payload, estimated_tokens('chat', payload), session.id, chat_hedge,
+                                              'chat', timeout=deadline.timeout(), should_stop=deadline.expired)
+                try:
+                    for chunk in chunks:
+                        if chunk.get('response'):
+                            pieces.append(chunk['response'])
+                            yield sse_event({'token': chunk['response']})
+                        if chunk.get('done'):
+                            final = chunk
+                except GenerationCancelled:
+                    metrics.inc("deadline_exceeded", route='chat')
+            if final:
+                record_completed('chat', final)
+            elif not pieces:
+                raise requests.exceptions.Timeout()
+            text = finish_chat_turn(session, msg, "".join(pieces), final)
+            done = {'response': text, 'session_id': session.id}
+            if not final:
+                done['partial'] = True
+            yield sse_event(done, event='done')
+        except GeneratorExit:
+            record_cancelled('chat', len(pieces))
+            raise
+        except requests.exceptions.Timeout:
+            yield sse_event({'error': 'AI timeout, try again'}, event='error')
+        except requests.HTTPError:
+            yield sse_event({'error': 'Model error'}, event='error')
+        except (CircuitOpenError, requests.exceptions.RequestException):
+            yield sse_event({'error': 'Ollama not running'}, event='error')
+        except Exception as e:
+            yield sse_event({'error': str(e)}, event='error')
+        finally:
+            if chunks is not None:
+                chunks.close()
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/chat/<session_id>', methods=['DELETE'])
+def reset_chat(session_id):
+    chat_sessions.reset(session_id)
+    return jsonify({'success': True})
+
+
+# ------ NOTES ------
+@app.route('/api/notes', methods=['POST'])
+def upload_notes():
+    try:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'success': False, 'error': 'File is required'}), 400
+
+        if os.path.splitext(upload.filename)[1].lower() not in ALLOWED_EXTENSIONS:
+            return jsonify({'success': False, 'error': 'Only .txt, .md and .pdf notes are supported'}), 400
+
+        doc = notes.add_document(upload.filename, upload.stream)
+        if notes_vectors is not None and not doc['duplicate']:
+            try:
+                embed_document(doc['id'])
+                doc['embedded'] = True
+            except Exception:
+                # Keyword retrieval still works without vectors
+                doc['embedded'] = False
+        return jsonify({'success': True, 'document': doc})
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/notes', methods=['GET'])
+def list_notes():
+    return jsonify({'success': True, 'documents': notes.documents()})
+
+
+@app.route('/api/notes/<int:doc_id>', methods=['DELETE'])
+def delete_notes(doc_id):
+    chunk_ids = [str(chunk_id) for chunk_id, _ in notes.document_chunks(doc_id)]
+    if not notes.remove_document(doc_id):
+        return jsonify({'success': False, 'error': 'Document not found'}), 404
+    if notes_vectors is not None:
+        # Chunk IDs get reused, so stale vectors must not keep matching
+        notes_vectors.remove(chunk_ids)
+    return jsonify({'success': True})
+
+
+# ------ PROGRESS & EXPORT ------
+@app.route('/api/progress', methods=['POST'])
+def record_progress():
+    try:
+        topic = request.json.get('topic', '').strip()
+        score = int(request.json.get('score', 0))
+        total = int(request.json.get('total', 0))
+        if not topic or total <= 0 or not 0 <= score <= total:
+            return jsonify({'success': False, 'error': 'Topic, score and total are required'}), 400
+
+        attempt_id = store.record_attempt(topic, score, total, request.json.get('deck_id'))
+        return jsonify({'success': True, 'attempt_id': attempt_id})
+
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Score and total must be numbers'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# format -> (delimiter, mimetype)
+EXPORT_FORMATS = {
+    'csv': (',', 'text/csv'),
+    'tsv': ('\t', 'text/tab-separated-values'),
+}
+
+def export_response(chunks, filename, mimetype):
+    # Generator body: rows go out as they are read, nothing is buffered whole
+    return Response(chunks, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@app.route('/api/export/decks.<fmt>', methods=['GET'])
+def export_decks(fmt):
+    kind = request.args.get('kind')
+    deck_id = request.args.get('deck_id')
+    cards = store.iter_cards(kind=kind, deck_id=deck_id)
+
+    if fmt == 'anki':
+        # Plain-text deck with Anki file headers: File > Import picks the columns up directly
+        chunks = stream_delimited(None, anki_rows(cards), '\t', ANKI_PREAMBLE)
+        return export_response(chunks, 'smartprep-anki.txt', 'text/plain')
+
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Format must be csv, tsv or anki'}), 400
+    delimiter, mimetype = EXPORT_FORMATS[fmt]
+    chunks = stream_delimited(('topic', 'kind', 'front', 'back'), cards, delimiter)
+    return export_response(chunks, f'smartprep-decks.{fmt}', mimetype)
+
+
+@app.route('/api/export/progress.<fmt>', methods=['GET'])
+def export_progress(fmt):
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Format must be csv or tsv'}), 400
+    delimiter, mimetype = EXPORT_FORMATS[fmt]
+    chunks = stream_delimited(('id', 'deck_id', 'topic', 'score', 'total', 'created'),
+                              store.iter_attempts(), delimiter)
+    return export_response(chunks, f'smartprep-progress.{fmt}', mimetype)
+
+
 @app.route("/dashboard")
 def dashboard():
-    return render_template("dashboard.html")
+    return pages.serve("dashboard.html")
 
 @app.route("/")
 def landing():
-    return render_template("index.html")
+    return pages.serve("index.html")
 
 
 
 if __name__ == '__main__':
+    # Development server only; use `python serve.py` in production
     print("🚀 SmartPrepAi running...")
-    print(f"🔗 Using Ollama at: {OLLAMA_HOST}")
+    print(f"🔗 Using Ollama at: {', '.join(host.url for host in pool.hosts)}")
     print("🌐 Server starting at: http://127.0.0.1:5000")  # ADD THIS LINE
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=os.getenv("FLASK_DEBUG", "0") == "1", port=5000)
\ No newline at end of file
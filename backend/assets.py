@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import Response, render_template, request, send_from_directory, url_for
+from markupsafe import Markup, escape
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Fingerprinted files never change, so browsers may keep them for a year
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+
+# Preferred order when the client accepts several encodings
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accepts(encoding: str) -> bool:
+    return request.accept_encodings[encoding] > 0
+
+
+class PageCache:
+    """
+    Pages whose templates depend only on the deploy (static URLs, no per-user
+    data) are rendered once per process, compressed once, and then served from
+    memory with a strong ETag. HTML isn't fingerprinted, so clients revalidate
+    on every load (no-cache) and normally get a 304.
+    When templates auto-reload (debug), entries are re-rendered as soon as
+    their template file changes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._pages = {}
+
+    def _render(self, name):
+        template = self.app.jinja_env.get_template(name)
+        body = render_template(template).encode("utf-8")
+        variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(body, quality=11)
+        etag = hashlib.sha256(body).hexdigest()[:20]
+        return template, etag, variants
+
+    def serve(self, name):
+        page = self._pages.get(name)
+        if page is None or (self.app.jinja_env.auto_reload and not page[0].is_up_to_date):
+            page = self._pages[name] = self._render(name)
+            metrics.inc("page_cache_renders", page=name)
+        _, etag, variants = page
+
+        encoding = "identity"
+        for enc, _suffix in _ENCODINGS:
+            if enc in variants and _accepts(enc):
+                encoding = enc
+                break
+        response = Response(variants[encoding], mimetype="text/html")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = "no-cache"
+        response.set_etag(f"{etag}-{encoding}")
+        return response.make_conditional(request)
+
+
+# Layout width hint for the landing-page illustrations (.step-image caps them at 380px)
+DEFAULT_SIZES = "(max-width: 420px) 90vw, 380px"
+
+
+def _srcset(variants) -> str:
+    return ", ".join(f"{url_for('static', filename=path)} {width}w" for width, path in variants)
+
+
+def init_images(app):
+    """
+    Register responsive_img() for templates. With build_images.py output it
+    renders a <picture> offering AVIF/WebP variants by width; either way the
+    <img> is lazy-loaded and carries its intrinsic size so the layout doesn't shift.
+    """
+    manifest_path = os.path.join(app.static_folder, "dist", "img", "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    @app.template_global()
+    def responsive_img(filename, alt, sizes=DEFAULT_SIZES, eager=False):
+        entry = manifest.get(filename)
+        attrs = f'src="{url_for("static", filename=filename)}" alt="{escape(alt)}"'
+        if entry:
+            attrs += f' width="{entry["width"]}" height="{entry["height"]}"'
+        # Above-the-fold images should not wait for layout
+        attrs += ' decoding="async"' if eager else ' loading="lazy" decoding="async"'
+        img = f"<img {attrs}>"
+        if not entry:
+            return Markup(img)
+        # Most compact format first: the browser takes the first type it supports
+        sources = "".join(
+            f'<source type="image/{fmt}" srcset="{_srcset(entry["variants"][fmt])}" sizes="{escape(sizes)}">'
+            for fmt in ("avif", "webp") if fmt in entry["variants"])
+        return Markup(f"<picture>{sources}{img}</picture>")
+
+
+def init_assets(app):
+    """
+    Serve the output of build_assets.py when it exists: url_for('static', ...)
+    resolves to fingerprinted names under dist/, and those are sent
+    precompressed (br/gzip by Accept-Encoding) with immutable caching.
+    Skipped in debug mode so edits to static/ show up without a rebuild.
+    """
+    dist_dir = os.path.join(app.static_folder, "dist")
+    manifest_path = os.path.join(dist_dir, "manifest.json")
+    if app.debug or not os.path.exists(manifest_path):
+        return
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = "dist/" + manifest[values["filename"]]
+
+    plain_static = app.view_functions["static"]
+
+    def static(filename):
+        if not filename.startswith("dist/") or filename.endswith(".json"):
+            return plain_static(filename=filename)
+        name = filename[len("dist/"):]
+        mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        send_name, encoding = name, None
+        for enc, suffix in _ENCODINGS:
+            if _accepts(enc) and os.path.isfile(os.path.join(dist_dir, name + suffix)):
+                send_name, encoding = name + suffix, enc
+                break
+
+        # send_file hands the open file to the server's wsgi.file_wrapper (sendfile)
+        response = send_from_directory(dist_dir, send_name, mimetype=mimetype, etag=False, max_age=None)
+        response.headers.pop("Content-Disposition", None)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE
+        # Strong ETag: the name already carries the content hash
+        response.set_etag(f"{name}-{encoding or 'identity'}")
+        return response.make_conditional(request)
+
+    app.view_functions["static"] = static
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Items (topic × kind) one batch may ask for
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "60"))
+# Items of one batch queued or running at once, so one teacher's unit doesn't
+# queue ahead of everyone else's (the scheduler's workers bound the total)
+BATCH_PARALLEL = int(os.getenv("BATCH_PARALLEL", "2"))
+# Finished jobs stay resumable this long
+BATCH_JOB_TTL = float(os.getenv("BATCH_JOB_TTL_SECONDS", "3600"))
+BATCH_MAX_JOBS = 200
+
+
+class BatchJob:
+    """
+    A list of (kind, topic) items and their results in the order they finished.
+    Readers follow `results` by position, so a client that lost its stream
+    resumes from the number of results it had already received.
+    """
+
+    def __init__(self, job_id: str, items):
+        self.id = job_id
+        self.items = list(items)
+        self.results = []
+        self.created = time.time()
+        self.finished = None
+        self._cond = threading.Condition()
+
+    def add_result(self, result: dict):
+        with self._cond:
+            self.results.append(result)
+            if len(self.results) == len(self.items):
+                self.finished = time.time()
+            self._cond.notify_all()
+
+    def done(self) -> bool:
+        return self.finished is not None
+
+    def follow(self, offset: int = 0):
+        """
+        Results from position `offset` on, waiting for each until the job is done.
+        """
+        while True:
+            with self._cond:
+                while offset >= len(self.results) and not self.done():
+                    self._cond.wait()
+                if offset >= len(self.results):
+                    return
+                result = self.results[offset]
+            offset += 1
+            yield result
+
+
+class BatchJobStore:
+    """
+    In-memory batch jobs keyed by job ID, like chat sessions: a resumed stream
+    must reach the worker process that runs the job. Finished jobs expire after
+    `ttl`; past `max_jobs` the oldest finished ones go first.
+    """
+
+    def __init__(self, ttl: float = BATCH_JOB_TTL, max_jobs: int = BATCH_MAX_JOBS):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, items) -> BatchJob:
+        job = BatchJob(uuid.uuid4().hex, items)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done()]
+        excess = len(self._jobs) - self.max_jobs
+        for job in finished:
+            if now - job.finished > self.ttl or excess > 0:
+                del self._jobs[job.id]
+                excess -= 1
@@ -0,0 +1,71 @@
+"""
+Chat sessions over several mock Ollama servers, routed by load alone vs by
+consistent hashing of the session ID. Each mock keeps a KV cache of the
+conversations it served; a follow-up that lands on another server has its
+whole context evaluated again.
+
+    python bench/bench_affinity.py --hosts 3 --sessions 12 --turns 6
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+
+import app as smartprep
+import metrics
+from mock_ollama import start_mock_server
+
+
+def session(client, turns, n, think):
+    session_id, timings = None, []
+    for i in range(turns):
+        time.sleep(random.uniform(0, think))  # the student reads and types
+        start = time.perf_counter()
+        data = client.post('/api/chat', json={
+            'message': f'Student {n}, follow-up {i}: how does the light reaction feed the Calvin cycle?',
+            'session_id': session_id}).get_json()
+        timings.append(time.perf_counter() - start)
+        assert data['success'], data
+        session_id = data['session_id']
+    return timings
+
+
+def stat(mocks, key):
+    return sum(m.stats[key] for m in mocks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=3)
+    parser.add_argument('--sessions', type=int, default=12)
+    parser.add_argument('--turns', type=int, default=6)
+    parser.add_argument('--think-ms', type=float, default=300.0)
+    parser.add_argument('--prompt-eval-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    client = smartprep.app.test_client()
+    for label, affinity in (('load only', False), ('affinity', True)):
+        mocks, urls = zip(*(start_mock_server(prompt_eval_ms=args.prompt_eval_ms, eval_ms=1.0, parallel=1)
+                            for _ in range(args.hosts)))
+        smartprep.pool.set_hosts(urls)
+        smartprep.pool.affinity = affinity
+        hits_before = metrics.get('pool_affinity', result='hit')
+        with ThreadPoolExecutor(args.sessions) as executor:
+            timings = [t for ts in executor.map(
+                lambda n: session(client, args.turns, n, args.think_ms / 1000), range(args.sessions))
+                       for t in ts]
+        follow_ups = args.sessions * (args.turns - 1)
+        hits = metrics.get('pool_affinity', result='hit') - hits_before
+        print(f"{label:>10}: prompt tokens evaluated {stat(mocks, 'prompt_tokens'):7d}, "
+              f"context misses {stat(mocks, 'context_misses'):3d}/{follow_ups}, "
+              f"p50 {statistics.median(timings) * 1000:6.1f} ms, "
+              f"p95 {statistics.quantiles(timings, n=20)[-1] * 1000:6.1f} ms, "
+              f"affinity hits {hits:.0f}, per host {[m.stats['generate'] for m in mocks]}")
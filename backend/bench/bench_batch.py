@@ -0,0 +1,78 @@
+"""
+A teacher preparing a unit: flashcards for N topics as N sequential
+/api/generate_flashcards calls vs one /api/batch/generate, against mock
+Ollama servers (one generation at a time each). Then the same batch again,
+now served from saved decks, and a stream resumed part-way through.
+
+    python bench/bench_batch.py --topics 20 --hosts 2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+os.environ.setdefault('GENERATION_WORKERS', '2')
+
+import app as smartprep
+from mock_ollama import start_mock_server
+
+
+def batch(client, topics):
+    # (seconds to the first result, seconds in total, result lines)
+    start = time.perf_counter()
+    response = client.post('/api/batch/generate', json={'topics': topics, 'kinds': ['flashcards']},
+                           buffered=False)
+    first, results = None, []
+    for line in response.response:
+        data = json.loads(line)
+        if 'index' in data:
+            first = first or time.perf_counter() - start
+            results.append(data)
+    response.close()
+    return first, time.perf_counter() - start, results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--topics', type=int, default=20)
+    parser.add_argument('--hosts', type=int, default=2)
+    parser.add_argument('--eval-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    mocks, urls = zip(*(start_mock_server(eval_ms=args.eval_ms, parallel=1) for _ in range(args.hosts)))
+    smartprep.pool.set_hosts(urls)
+    client = smartprep.app.test_client()
+
+    topics = [f'Sequential topic {n}' for n in range(args.topics)]
+    start = time.perf_counter()
+    first = None
+    for topic in topics:
+        assert client.post('/api/generate_flashcards', json={'topic': topic}).get_json()['success']
+        first = first or time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    print(f"sequential: first deck {first * 1000:7.1f} ms, all {args.topics} in {elapsed:6.2f} s")
+
+    topics = [f'Batch topic {n}' for n in range(args.topics)]
+    first, elapsed, results = batch(client, topics)
+    ok = sum(r['success'] for r in results)
+    print(f"     batch: first deck {first * 1000:7.1f} ms, all {args.topics} in {elapsed:6.2f} s ({ok} ok)")
+
+    first, elapsed, results = batch(client, topics)
+    cached = sum(r.get('cached', False) for r in results)
+    print(f"    cached: first deck {first * 1000:7.1f} ms, all {args.topics} in {elapsed:6.2f} s ({cached} cached)")
+
+    # Read a few results, drop the stream, and pick it up again by job ID
+    response = client.post('/api/batch/generate', json={'topics': [f'Resumed topic {n}' for n in range(6)]},
+                           buffered=False)
+    lines = iter(response.response)
+    job_id = json.loads(next(lines))['job_id']
+    seen = [json.loads(next(lines))['index'] for _ in range(2)]
+    response.close()
+    resumed = [json.loads(line) for line in client.get(f'/api/batch/{job_id}?offset={len(seen)}').response]
+    print(f"   resumed: {len(seen)} before the drop, {sum('index' in r for r in resumed)} after, "
+          f"indexes {sorted(seen + [r['index'] for r in resumed if 'index' in r])}")
@@ -0,0 +1,49 @@
+"""
+Per-turn /api/chat latency: client re-sending the whole history vs server-side
+sessions that reuse Ollama's context tokens. Runs against the mock Ollama server.
+
+    python bench/bench_chat_turns.py --turns 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as smartprep
+from mock_ollama import start_mock_server
+
+
+def run(client, turns, stateful):
+    history = []
+    session_id = None
+    timings = []
+    for i in range(1, turns + 1):
+        msg = f"Follow-up question number {i} about photosynthesis and the Calvin cycle?"
+        body = {'message': msg}
+        if stateful:
+            body['session_id'] = session_id
+        else:
+            body['context'] = "\n".join(history)
+        start = time.perf_counter()
+        data = client.post('/api/chat', json=body).get_json()
+        timings.append(time.perf_counter() - start)
+        assert data['success'], data
+        session_id = data.get('session_id')
+        history.append(f"User: {msg}\nTutor: {data['response']}")
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--turns', type=int, default=20)
+    args = parser.parse_args()
+
+    _, url = start_mock_server(eval_ms=0.2)
+    smartprep.pool.set_hosts([url])
+    client = smartprep.app.test_client()
+
+    for label, stateful in (('resend history', False), ('session context', True)):
+        t = run(client, args.turns, stateful)
+        print(f"{label:>16}: turn 1 {t[0] * 1000:7.1f} ms | turn {args.turns} {t[-1] * 1000:7.1f} ms")
@@ -0,0 +1,62 @@
+"""
+Circuit breaker against the mock Ollama server: the model wedges (accepts
+requests, never answers), then recovers. Shows how long each request takes
+while the circuit is closed, open and half-open, and the state transitions.
+
+    python bench/bench_circuit.py --deadline-ms 1500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+# Small thresholds so the run takes seconds rather than minutes
+os.environ.setdefault('CIRCUIT_SLOW_SECONDS', '1')
+os.environ.setdefault('CIRCUIT_MIN_CALLS', '3')
+os.environ.setdefault('CIRCUIT_OPEN_SECONDS', '2')
+
+import app as smartprep
+import metrics
+from mock_ollama import start_mock_server
+
+
+def timed(client, path, body, deadline_ms):
+    start = time.perf_counter()
+    response = client.post(path, json=body, headers={'X-Deadline-Ms': str(deadline_ms)})
+    data = response.get_json()
+    note = 'cached' if data.get('cached') else data.get('error', 'ok')
+    return response.status_code, note, (time.perf_counter() - start) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deadline-ms', type=int, default=1500)
+    parser.add_argument('--eval-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    mock, url = start_mock_server(eval_ms=args.eval_ms)
+    smartprep.pool.set_hosts([url])
+    client = smartprep.app.test_client()
+    breaker = smartprep.pool.hosts[0].breaker
+
+    def run(label, requests):
+        print(f"-- {label}")
+        for path, body in requests:
+            status, note, ms = timed(client, path, body, args.deadline_ms)
+            print(f"   {path:<26} {status} {note:<20} {ms:8.1f} ms   circuit {breaker.state}")
+
+    flashcards = ('/api/generate_flashcards', {'topic': 'Photosynthesis'})
+    chat = ('/api/chat', {'message': 'What does RuBisCO do?'})
+
+    run('healthy', [flashcards, chat])
+    mock.fault = 'hang'
+    run('wedged', [chat] * 3 + [flashcards, chat, chat])
+    mock.fault = None
+    time.sleep(breaker.retry_after() + 0.1)
+    run('recovered', [chat] * 4)
+
+    print({k: v for k, v in metrics.snapshot()['counters'].items() if k.startswith('circuit_')})
@@ -0,0 +1,90 @@
+"""
+CPU vs bytes for the compression middleware's levels, on typical API bodies:
+a flashcards and a quiz response, a chat answer, a 500-row CSV export chunk,
+and a token-by-token SSE stream flushed per event.
+
+    python bench/bench_compression.py
+"""
+import csv
+import io
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import _Brotli, _Gzip, brotli
+
+LEVELS = [("gzip", 1), ("gzip", 6), ("gzip", 9)]
+if brotli is not None:
+    LEVELS += [("br", 1), ("br", 4), ("br", 6), ("br", 9), ("br", 11)]
+
+
+def payloads():
+    terms = ["chlorophyll", "the thylakoid", "ATP synthase", "RuBisCO", "the stroma"]
+    flashcards = "\n\n".join(
+        f"Q{i}: What role does {t} play in photosynthesis?\n"
+        f"A{i}: {t.capitalize()} drives one stage of turning light energy into chemical energy in plants."
+        for i, t in enumerate(terms, 1))
+    quiz = "\n\n".join(
+        f"Q{i}. Which statement about {t} is correct?\nA) It happens only at night\n"
+        f"B) It needs light energy\nC) It releases nitrogen\nD) None of these\nAnswer: B"
+        for i, t in enumerate(terms[:3], 1))
+    chat = ("- **Light reactions**: chlorophyll absorbs light and splits water, releasing oxygen.\n\n"
+            "- **Calvin cycle**: RuBisCO fixes CO2 into sugars using ATP and NADPH.\n\n") * 3
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for i in range(500):
+        writer.writerow((i, "f" * 32, f"topic {i % 40}", i % 4, 3, 1700000000.0 + i))
+    return {
+        "flashcards json": json.dumps({"success": True, "flashcards_text": flashcards, "deck_id": "d" * 32}).encode(),
+        "quiz json": json.dumps({"success": True, "quiz_text": quiz, "deck_id": "d" * 32}).encode(),
+        "chat json": json.dumps({"success": True, "response": chat, "session_id": "s" * 32}).encode(),
+        "csv chunk": buf.getvalue().encode(),
+    }
+
+
+def sse_events():
+    words = ("Chlorophyll absorbs light energy which splits water and releases oxygen " * 10).split()
+    return [f"data: {json.dumps({'token': w + ' '})}\n\n".encode() for w in words]
+
+
+def compress_whole(make, data):
+    c = make()
+    return c.compress(data) + c.finish()
+
+
+def compress_events(make, events):
+    c = make()
+    out = [c.compress(e) + c.flush() for e in events]
+    out.append(c.finish())
+    return b"".join(out)
+
+
+def factory(kind, level):
+    return (lambda: _Gzip(level)) if kind == "gzip" else (lambda: _Brotli(level))
+
+
+def best_us(fn, number=200):
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == "__main__":
+    if brotli is None:
+        print("brotli not installed: only gzip levels are measured")
+    items = list(payloads().items())
+    events = sse_events()
+    header = f"{'level':<10}" + "".join(f"{name:>22}" for name, _ in items) + f"{'sse (flush/event)':>24}"
+    print(header)
+    print(f"{'identity':<10}" + "".join(f"{len(d):>14} B      " for _, d in items)
+          + f"{sum(map(len, events)):>16} B      ")
+    for kind, level in LEVELS:
+        make = factory(kind, level)
+        row = f"{kind + ' ' + str(level):<10}"
+        for _, data in items:
+            size = len(compress_whole(make, data))
+            row += f"{size:>8} B {best_us(lambda: compress_whole(make, data)):>8.0f} µs "
+        size = len(compress_events(make, events))
+        row += f"{size:>10} B {best_us(lambda: compress_events(make, events), 20):>8.0f} µs"
+        print(row)
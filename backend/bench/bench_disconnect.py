@@ -0,0 +1,98 @@
+"""
+Client disconnects against the mock Ollama server: a student closes the tab
+part-way through a flashcards request (buffered JSON) and a chat stream (SSE).
+Checks that the upstream generation is aborted and reports how many tokens
+the model did not have to produce.
+
+    python bench/bench_disconnect.py --eval-ms 20 --hang-up-after 0.5
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+
+from werkzeug.serving import make_server
+
+import app as smartprep
+import metrics
+from mock_ollama import start_mock_server
+
+
+def post_and_hang_up(port, path, body, hang_up_after, read_events=0):
+    data = json.dumps(body).encode()
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    received = b""
+    deadline = time.monotonic() + hang_up_after
+    sock.settimeout(0.05)
+    while time.monotonic() < deadline and received.count(b"\n\n") < read_events + 1:
+        try:
+            received += sock.recv(65536)
+        except socket.timeout:
+            pass
+    sock.close()
+    return received
+
+
+def wait_for_idle(mock, timeout=10.0):
+    # The mock counts a token each time it streams one; idle means nothing moved for a while
+    last, stable_since = -1, time.monotonic()
+    while time.monotonic() - stable_since < 0.3 and timeout > 0:
+        now = mock.stats['eval_tokens']
+        if now != last:
+            last, stable_since = now, time.monotonic()
+        time.sleep(0.05)
+        timeout -= 0.05
+    return last
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--eval-ms', type=float, default=20.0)
+    parser.add_argument('--hang-up-after', type=float, default=0.5)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    mock, url = start_mock_server(eval_ms=args.eval_ms)
+    smartprep.pool.set_hosts([url])
+    server = make_server('127.0.0.1', 0, smartprep.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    # Full lengths for reference: one complete request each
+    client = smartprep.app.test_client()
+    before = mock.stats['eval_tokens']
+    client.post('/api/generate_flashcards', json={'topic': 'Reference run'})
+    full_flashcards = mock.stats['eval_tokens'] - before
+    smartprep.scheduler.drain(timeout=30)  # let the speculative quiz finish too
+    before = wait_for_idle(mock)
+    client.post('/api/chat', json={'message': 'Reference question?'})
+    full_chat = mock.stats['eval_tokens'] - before
+
+    scenarios = [
+        ('flashcards (JSON)', '/api/generate_flashcards', {'topic': 'Photosynthesis'}, 0, full_flashcards),
+        ('chat (SSE)', '/api/chat/stream', {'message': 'What does RuBisCO do?'}, 3, full_chat),
+    ]
+    for label, path, body, events, full in scenarios:
+        before = wait_for_idle(mock)
+        aborted = mock.stats['aborted']
+        start = time.perf_counter()
+        post_and_hang_up(port, path, body, args.hang_up_after, events)
+        generated = wait_for_idle(mock) - before
+        freed = time.perf_counter() - start - 0.3  # minus the idle detection window
+        ok = mock.stats['aborted'] > aborted
+        print(f"{label:>18}: {'aborted' if ok else 'NOT aborted'} upstream after {generated}/{full} tokens, "
+              f"model free {freed:.2f} s after the request started (full run ≈ {full * args.eval_ms / 1000:.2f} s)")
+
+    print({k: v for k, v in metrics.snapshot()['counters'].items() if k.startswith('generation_')})
+    server.shutdown()
@@ -0,0 +1,44 @@
+"""
+Brute-force top-k search over the memory-mapped embedding store.
+
+    python bench/bench_embedding_search.py --rows 200000 --dim 768 --dtype float16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_store import EmbeddingStore
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float16'])
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    store = EmbeddingStore(os.path.join(tempfile.mkdtemp(), "vectors"), args.dim, args.dtype)
+
+    start = time.perf_counter()
+    for offset in range(0, args.rows, 50000):
+        n = min(50000, args.rows - offset)
+        store.append([str(i) for i in range(offset, offset + n)], rng.standard_normal((n, args.dim), dtype=np.float32))
+    print(f"appended {len(store)} rows ({args.dtype}) in {time.perf_counter() - start:.1f} s")
+
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    store.search(queries[0], 10)  # map + fault pages in
+    timings = []
+    for q in queries:
+        t = time.perf_counter()
+        store.search(q, 10)
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    print(f"top-10 p50 {timings[len(timings) // 2]:.2f} ms | p99 {timings[int(len(timings) * 0.99)]:.2f} ms")
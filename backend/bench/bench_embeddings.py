@@ -0,0 +1,53 @@
+"""
+Embeddings/sec against the mock Ollama server: one /api/embeddings call per
+text vs the batching, de-duplicating EmbeddingService.
+
+    python bench/bench_embeddings.py --texts 2000 --dup 0.3
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client
+from embedding_service import EmbeddingService
+from mock_ollama import start_mock_server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--texts', type=int, default=2000)
+    parser.add_argument('--dup', type=float, default=0.3, help='fraction of repeated texts')
+    parser.add_argument('--callers', type=int, default=8, help='concurrent request threads')
+    args = parser.parse_args()
+
+    _, url = start_mock_server(embed_ms=10)
+    llm_client.OLLAMA_EMBED_URL = url + "/api/embeddings"
+    llm_client.OLLAMA_EMBED_BATCH_URL = url + "/api/embed"
+
+    rng = random.Random(7)
+    unique = [f"chunk {i} about cell biology and energy" for i in range(args.texts)]
+    texts = [rng.choice(unique[:i + 1]) if rng.random() < args.dup else unique[i] for i in range(args.texts)]
+    groups = [texts[i:i + 10] for i in range(0, len(texts), 10)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.callers) as pool:
+        list(pool.map(lambda g: [llm_client.embed_from_ollama(t) for t in g], groups))
+    naive = time.perf_counter() - start
+    print(f"one call per text : {len(texts) / naive:8.0f} embeddings/s")
+
+    service = EmbeddingService(llm_client.embed_batch_from_ollama, os.path.join(tempfile.mkdtemp(), "cache.db"))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.callers) as pool:
+        list(pool.map(service.embed_many, groups))
+    batched = time.perf_counter() - start
+    print(f"EmbeddingService  : {len(texts) / batched:8.0f} embeddings/s  {service.stats}")
+
+    start = time.perf_counter()
+    service.embed_many(texts)
+    print(f"warm cache        : {len(texts) / (time.perf_counter() - start):8.0f} embeddings/s")
@@ -0,0 +1,46 @@
+"""
+Streaming export at scale: inserts N quiz attempts, then streams
+/api/export/progress.csv and reports throughput and peak Python heap use.
+
+    python bench/bench_export.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+
+import app as smartprep
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    store = smartprep.store
+    start = time.perf_counter()
+    with store._db:
+        store._db.executemany(
+            "INSERT INTO attempts (deck_id, topic, score, total, created) VALUES (?, ?, ?, ?, ?)",
+            ((None, f"topic {i % 500}", i % 4, 3, 1700000000 + i) for i in range(args.rows)),
+        )
+    print(f"inserted {args.rows} attempts in {time.perf_counter() - start:.1f} s")
+
+    client = smartprep.app.test_client()
+    tracemalloc.start()
+    start = time.perf_counter()
+    resp = client.get('/api/export/progress.csv', buffered=False)
+    total_bytes = 0
+    for chunk in resp.response:
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"streamed {total_bytes / 1e6:.1f} MB in {elapsed:.1f} s "
+          f"({args.rows / elapsed:,.0f} rows/s), peak heap {peak / 1e6:.2f} MB")
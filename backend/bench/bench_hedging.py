@@ -0,0 +1,65 @@
+"""
+Hedged /api/chat requests over several mock Ollama servers that each stall
+before the first token now and then. Compares latency percentiles and the
+extra upstream load with hedging off and on.
+
+    python bench/bench_hedging.py --requests 400 --stall-rate 0.03 --stall-ms 800
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+
+import app as smartprep
+import metrics
+from hedging import HedgePolicy
+from mock_ollama import start_mock_server
+
+
+def one(client, i):
+    start = time.perf_counter()
+    data = client.post('/api/chat', json={'message': f'Question {i}: what is osmosis?'}).get_json()
+    assert data['success'], data
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--stall-rate', type=float, default=0.03)
+    parser.add_argument('--stall-ms', type=float, default=800.0)
+    args = parser.parse_args()
+
+    mocks, urls = zip(*(start_mock_server(eval_ms=0.5) for _ in range(args.hosts)))
+    for mock in mocks:
+        mock.stall_rate, mock.stall_ms = args.stall_rate, args.stall_ms
+    smartprep.pool.set_hosts(urls)
+    client = smartprep.app.test_client()
+
+    for label, policy in (('no hedging', None), ('hedging', HedgePolicy('chat'))):
+        smartprep.chat_hedge = policy
+        if policy is not None:
+            # Learn the TTFT distribution first (a few requests, not measured)
+            for i in range(30):
+                one(client, i)
+        sent_before = metrics.get('hedge_sent', route='chat')
+        calls_before = sum(m.stats['generate'] for m in mocks)
+        with ThreadPoolExecutor(args.clients) as executor:
+            timings = sorted(executor.map(lambda i: one(client, i), range(args.requests)))
+        calls = sum(m.stats['generate'] for m in mocks) - calls_before
+        sent = metrics.get('hedge_sent', route='chat') - sent_before
+        pct = statistics.quantiles(timings, n=100)
+        print(f"{label:>11}: p50 {pct[49] * 1000:6.1f} ms  p95 {pct[94] * 1000:6.1f} ms  "
+              f"p99 {pct[98] * 1000:6.1f} ms  max {timings[-1] * 1000:6.1f} ms  "
+              f"hedges {sent:.0f} ({sent / args.requests:.1%}), upstream calls {calls}")
+    print({k: v for k, v in metrics.snapshot()['counters'].items() if k.startswith('hedge_')},
+          metrics.get('ttft_p95_seconds', route='chat'))
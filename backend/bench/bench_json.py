@@ -0,0 +1,82 @@
+"""
+JSON codec micro-benchmark on the payloads the app actually moves: encoding
+the flashcards / quiz / chat responses, decoding Ollama's non-streaming reply
+(with its context array) and decoding a streamed NDJSON generation.
+Compares Flask's stdlib defaults with orjson (when installed).
+
+    python bench/bench_json.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlib_dumps(obj):
+    # What Flask's DefaultJSONProvider does outside debug mode
+    return json.dumps(obj, ensure_ascii=True, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def payloads():
+    flashcards = "\n\n".join(
+        f"Q{i}: What role does {term} play in photosynthesis?\n"
+        f"A{i}: {term.capitalize()} is essential because it drives one stage of turning light into chemical energy."
+        for i, term in enumerate(["chlorophyll", "the thylakoid", "ATP synthase", "RuBisCO", "the stroma"], 1))
+    quiz = "\n\n".join(
+        f"Q{i}. Which statement about {term} is correct?\n"
+        "A) It happens only at night\nB) It needs light energy\nC) It releases nitrogen\nD) None of these\n"
+        "Answer: B"
+        for i, term in enumerate(["the light reactions", "photolysis", "the Calvin cycle"], 1))
+    chat = " ".join(["Chlorophyll absorbs light energy to split water molecules — “photolysis”."] * 10)  # ~100 words
+    context = list(range(32000, 33500))  # a chat turn's context tokens
+    return {
+        'flashcards response': {'success': True, 'flashcards_text': flashcards, 'deck_id': 'f' * 32},
+        'quiz response': {'success': True, 'quiz_text': quiz, 'deck_id': 'q' * 32},
+        'chat response': {'success': True, 'response': chat, 'session_id': 's' * 32},
+        'ollama reply (chat)': {'model': 'phi3:mini', 'response': chat, 'done': True, 'context': context,
+                                'prompt_eval_count': 380, 'eval_count': 150,
+                                'prompt_eval_duration': 190000000, 'eval_duration': 3000000000},
+    }
+
+
+def ndjson_stream(text):
+    lines = [json.dumps({'model': 'phi3:mini', 'created_at': '2025-01-01T00:00:00Z',
+                         'response': word + ' ', 'done': False}).encode() for word in text.split()]
+    lines.append(json.dumps({'model': 'phi3:mini', 'response': '', 'done': True,
+                             'context': list(range(1500))}).encode())
+    return lines
+
+
+def bench(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    return best * 1e6
+
+
+if __name__ == '__main__':
+    codecs = [('stdlib', stdlib_dumps, json.loads)]
+    if orjson is not None:
+        codecs.append(('orjson', orjson.dumps, orjson.loads))
+    else:
+        print("orjson not installed: only the stdlib codec is measured")
+
+    print(f"{'payload':<24}{'bytes':>8}" + "".join(f"{name + ' enc µs':>16}{name + ' dec µs':>16}"
+                                               for name, _, _ in codecs))
+    for label, obj in payloads().items():
+        encoded = stdlib_dumps(obj)
+        row = f"{label:<24}{len(encoded):>8}"
+        for _, dumps, loads in codecs:
+            row += f"{bench(lambda: dumps(obj), 2000):>16.1f}{bench(lambda: loads(encoded), 2000):>16.1f}"
+        print(row)
+
+    lines = ndjson_stream(payloads()['chat response']['response'])
+    row = f"{'ndjson stream':<24}{sum(map(len, lines)):>8}"
+    for _, dumps, loads in codecs:
+        row += f"{'':>16}{bench(lambda: [loads(line) for line in lines], 200):>16.1f}"
+    print(row)
@@ -0,0 +1,54 @@
+"""
+BM25 query latency over a synthetic notes index (default 100k chunks).
+
+    python bench/bench_notes_bm25.py --chunks 100000
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notes_index import CHUNK_OVERLAP, CHUNK_WORDS, NotesIndex
+
+
+def synthetic_document(rng, vocab, chunks):
+    # Zipf-ish word frequencies, like real prose
+    words = rng.choices(vocab, weights=[1 / (i + 1) for i in range(len(vocab))], k=chunks * (CHUNK_WORDS - CHUNK_OVERLAP))
+    lines = (" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+    return io.BytesIO("\n".join(lines).encode())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vocab = [f"term{i}" for i in range(30000)]
+    path = os.path.join(tempfile.mkdtemp(), "notes.db")
+    index = NotesIndex(path)
+
+    start = time.perf_counter()
+    # Several documents so indexing is exercised incrementally
+    per_doc = 10000
+    for n in range(0, args.chunks, per_doc):
+        index.add_document(f"doc{n}.txt", synthetic_document(rng, vocab, min(per_doc, args.chunks - n)))
+    print(f"indexed {len(index)} chunks in {time.perf_counter() - start:.1f} s")
+
+    queries = [" ".join(rng.choices(vocab[50:5000], k=rng.randint(2, 6))) for _ in range(args.queries)]
+    for q in queries:
+        index.search(q)  # warm postings cache
+
+    timings = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q, 4)
+        timings.append((time.perf_counter() - t) * 1000)
+    timings.sort()
+    print(f"query p50 {timings[len(timings) // 2]:.2f} ms | p99 {timings[int(len(timings) * 0.99)]:.2f} ms")
@@ -0,0 +1,73 @@
+"""
+Several mock Ollama servers (one generation at a time each, like a single
+loaded model) behind the backend pool: concurrent /api/chat
+requests spread over one vs three hosts, then one host fails and recovers.
+
+    python bench/bench_pool.py --hosts 3 --clients 6 --requests 36
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+os.environ.setdefault('CIRCUIT_MIN_CALLS', '3')
+os.environ.setdefault('CIRCUIT_OPEN_SECONDS', '2')
+
+import app as smartprep
+import metrics
+from mock_ollama import start_mock_server
+
+
+def load(client, clients, requests):
+    def one(i):
+        response = client.post('/api/chat', json={'message': f'Question {i} about the Krebs cycle?'})
+        return response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        statuses = list(executor.map(one, range(requests)))
+    return time.perf_counter() - start, statuses
+
+
+def served(mocks):
+    return [m.stats['generate'] for m in mocks]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hosts', type=int, default=3)
+    parser.add_argument('--clients', type=int, default=6)
+    parser.add_argument('--requests', type=int, default=36)
+    parser.add_argument('--eval-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    mocks, urls = zip(*(start_mock_server(eval_ms=args.eval_ms, parallel=1) for _ in range(args.hosts)))
+    client = smartprep.app.test_client()
+
+    for label, hosts in (('1 host', urls[:1]), (f'{args.hosts} hosts', urls)):
+        smartprep.pool.set_hosts(hosts)
+        before = served(mocks)
+        elapsed, statuses = load(client, args.clients, args.requests)
+        split = [after - b for after, b in zip(served(mocks), before)]
+        print(f"{label:>8}: {args.requests / elapsed:6.1f} req/s, {statuses.count(200)}/{len(statuses)} ok, "
+              f"per host {split}")
+
+    mocks[-1].fault = 'error'
+    before = served(mocks)
+    _, statuses = load(client, args.clients, args.requests)
+    split = [after - b for after, b in zip(served(mocks), before)]
+    print(f"  failing: {statuses.count(200)}/{len(statuses)} ok, per host {split}, "
+          f"ejected {metrics.get('circuit_transitions', breaker=urls[-1], to='open'):.0f}x")
+
+    mocks[-1].fault = None
+    time.sleep(smartprep.pool.hosts[-1].breaker.retry_after() + 0.1)
+    before = served(mocks)
+    _, statuses = load(client, args.clients, args.requests)
+    split = [after - b for after, b in zip(served(mocks), before)]
+    print(f"recovered: {statuses.count(200)}/{len(statuses)} ok, per host {split}, "
+          f"circuit {smartprep.pool.hosts[-1].breaker.state}")
@@ -0,0 +1,57 @@
+"""
+Flashcard and quiz generations for many different topics with the version 1
+prompt templates (topic first) vs version 2 (static system prefix, topic
+last). The mock keeps Ollama's prompt cache: only tokens after the longest
+prefix it has already seen are evaluated.
+
+    python bench/bench_prompts.py --topics 40
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+
+import app as smartprep
+import prompts
+from mock_ollama import _tokens, start_mock_server
+
+TOPICS = ['photosynthesis', 'the French Revolution', 'plate tectonics', 'supply and demand', 'the cell cycle',
+          'Newton\'s laws', 'the water cycle', 'World War I', 'covalent bonding', 'the Krebs cycle']
+
+
+def generate(kind, topic):
+    start = time.perf_counter()
+    payload = smartprep.deck_payload(kind, topic)
+    final = {}
+    for chunk in smartprep.pool.stream_generate(payload, route=kind, timeout=60):
+        if chunk.get('done'):
+            final = chunk
+    return time.perf_counter() - start, final.get('prompt_eval_count', 0), final.get('prompt_eval_duration', 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--topics', type=int, default=40)
+    parser.add_argument('--prompt-eval-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    topics = [f'{TOPICS[n % len(TOPICS)]} (unit {n})' for n in range(args.topics)]
+    for version in (1, 2):
+        mock, url = start_mock_server(prompt_eval_ms=args.prompt_eval_ms, eval_ms=0.5)
+        smartprep.pool.set_hosts([url])
+        prompts.PINNED_VERSIONS.update(flashcards=version, quiz=version)
+        results = [generate(kind, topic) for topic in topics for kind in ('flashcards', 'quiz')]
+        timings = [r[0] for r in results]
+        sent = sum(len(_tokens(p.get('system', '')) + _tokens(p['prompt']))
+                   for p in (smartprep.deck_payload(k, t) for t in topics for k in ('flashcards', 'quiz')))
+        print(f"v{version}: prompt tokens evaluated {sum(r[1] for r in results):6d} of {sent:6d} sent, "
+              f"prompt eval {sum(r[2] for r in results) / 1e9:6.2f} s, "
+              f"p50 {statistics.median(timings) * 1000:6.1f} ms, "
+              f"p95 {statistics.quantiles(timings, n=20)[-1] * 1000:6.1f} ms")
+        mock.shutdown()
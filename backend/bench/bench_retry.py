@@ -0,0 +1,67 @@
+"""
+Retries of transient Ollama failures against mock servers: occasional 503s,
+a host that refuses connections, and a retry storm held back by the budget.
+Reports success rate and upstream attempts per request with retries off and on.
+
+    python bench/bench_retry.py --requests 300
+"""
+import argparse
+import os
+import socket
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('SMARTPREP_DATA_DIR', tempfile.mkdtemp())
+
+import app as smartprep
+import metrics
+from mock_ollama import start_mock_server
+from retry_budget import RetryBudget
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def one(client, i):
+    return client.post('/api/chat', json={'message': f'Question {i}: what is diffusion?'}).status_code
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--clients', type=int, default=4)
+    args = parser.parse_args()
+
+    client = smartprep.app.test_client()
+    # (label, share of 503s, add a host that refuses connections, let the circuit breaker open)
+    scenarios = [
+        ('5% 503s', 0.05, False, True),
+        ('refusing host', 0.0, True, True),
+        ('60% 503s', 0.6, False, False),  # a storm: only the retry budget holds it back
+    ]
+    for label, error_rate, with_dead_host, breaker in scenarios:
+        for retries in (False, True):
+            mock, url = start_mock_server(eval_ms=0.2)
+            mock.error_rate = error_rate
+            smartprep.pool.set_hosts([url, f'http://127.0.0.1:{unused_port()}'] if with_dead_host else [url])
+            if not breaker:
+                for host in smartprep.pool.hosts:
+                    host.breaker.failure_rate = 2.0
+            smartprep.pool.retry_budget = RetryBudget() if retries else RetryBudget(ratio=0)
+            retried = metrics.get('upstream_retries', route='chat', reason='busy') + metrics.get(
+                'upstream_retries', route='chat', reason='connection')
+            with ThreadPoolExecutor(args.clients) as executor:
+                statuses = list(executor.map(lambda i: one(client, i), range(args.requests)))
+            retried = metrics.get('upstream_retries', route='chat', reason='busy') + metrics.get(
+                'upstream_retries', route='chat', reason='connection') - retried
+            attempts = mock.stats['generate'] + mock.stats['errors']
+            print(f"{label:>14}, retries {'on ' if retries else 'off'}: {statuses.count(200) / len(statuses):6.1%} ok, "
+                  f"{retried:4.0f} retries ({retried / args.requests:5.1%} extra), "
+                  f"{attempts / args.requests:.2f} calls/request on the live host")
+    print({k: v for k, v in metrics.snapshot()['counters'].items() if k.startswith('upstream_')})
@@ -0,0 +1,83 @@
+"""
+Requests/sec on /api/health and a static asset: Werkzeug dev server
+(`app.run(debug=True)`, the old entry point) vs `serve.py` (gunicorn).
+
+    python bench/bench_server_rps.py --seconds 5 --concurrency 16
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_PORT = 11499
+
+
+def wait_for(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/static/styles.css")
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def measure(port, path, seconds, concurrency):
+    stop = time.time() + seconds
+    counts = [0] * concurrency
+
+    def worker(i):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        while time.time() < stop:
+            try:
+                conn.request("GET", path)
+                conn.getresponse().read()
+                counts[i] += 1
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / seconds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    # Mock Ollama in its own process so it doesn't share a GIL with the load generator
+    mock = subprocess.Popen([sys.executable, 'mock_ollama.py', '--port', str(MOCK_PORT)], cwd=BACKEND,
+                            stdout=subprocess.DEVNULL)
+    env = dict(os.environ, OLLAMA_HOST=f"http://127.0.0.1:{MOCK_PORT}", SMARTPREP_DATA_DIR=tempfile.mkdtemp())
+    servers = {
+        'dev server (debug)': (5101, [sys.executable, '-c',
+                                      'import app; app.app.run(port=5101, debug=True, use_reloader=False)']),
+        'serve.py': (5102, [sys.executable, 'serve.py', '--bind', '127.0.0.1:5102',
+                            '--workers', str(args.workers), '--threads', '4']),
+    }
+    for label, (port, cmd) in servers.items():
+        proc = subprocess.Popen(cmd, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port)
+            for path in ('/api/health', '/static/styles.css'):
+                rps = measure(port, path, args.seconds, args.concurrency)
+                print(f"{label:>18} {path:<20} {rps:8.0f} req/s")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    mock.terminate()
@@ -0,0 +1,71 @@
+"""
+Worker cold-start budget: imports the app in fresh interpreters (what a
+gunicorn worker does with --no-preload), reports the slowest imports from
+`python -X importtime`, and exits non-zero when the median import time is
+over budget, so it can gate CI.
+
+    python bench/bench_startup.py --budget-ms 400
+    NOTES_EMBEDDINGS=hash python bench/bench_startup.py   # with the NumPy subsystem
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Timed inside the child so interpreter start-up itself isn't counted
+_TIMED_IMPORT = "import time; t = time.perf_counter(); import app; print((time.perf_counter() - t) * 1000)"
+
+
+def _run(args):
+    env = dict(os.environ, SMARTPREP_DATA_DIR=tempfile.mkdtemp())
+    return subprocess.run([sys.executable, *args], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_times():
+    """
+    (module, self_us, cumulative_us, depth) for every import of one cold run.
+    """
+    rows = []
+    for line in _run(["-X", "importtime", "-c", "import app"]).stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '400')))
+    parser.add_argument('--top', type=int, default=12)
+    args = parser.parse_args()
+
+    _run(["-c", "import app"])  # warm the bytecode and OS file caches
+    timings = [float(_run(["-c", _TIMED_IMPORT]).stdout.split()[-1]) for _ in range(args.runs)]
+
+    rows = import_times()
+    # importtime lists a module after everything it imported
+    end = next(i for i, row in enumerate(rows) if row[0] == "app")
+    start = end
+    while start > 0 and rows[start - 1][3] > rows[end][3]:
+        start -= 1
+    print("direct imports of app.py (cumulative ms):")
+    direct = [(cum, name) for name, _, cum, depth in rows[start:end] if depth == rows[end][3] + 1]
+    for cum, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"  {cum / 1000:8.1f}  {name}")
+    print("slowest modules (self ms):")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f}  {name}")
+
+    median = statistics.median(timings)
+    print(f"import app: median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if median > args.budget_ms:
+        sys.exit(f"FAIL: worker cold start {median:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
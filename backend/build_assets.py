@@ -0,0 +1,108 @@
+"""
+Build step for static assets: minify JS/CSS, fingerprint file names and
+precompress text assets (gzip, plus brotli when the package is installed).
+
+    python build_assets.py
+
+Output goes to static/dist/ together with manifest.json, which maps original
+names (e.g. "app.js") to fingerprinted ones ("app.3f2a1b9c0d.js"). assets.py
+rewrites url_for('static', ...) with it and serves the files. Run it on every
+deploy; files left over from older builds are removed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST = "manifest.json"
+
+# Only text formats benefit from precompression; images are already compressed
+COMPRESSIBLE = {".js", ".css", ".svg", ".json", ".txt", ".html"}
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text: str) -> str:
+    """
+    Conservative: without a real JS parser we only strip indentation, blank
+    lines and whole-line // comments, which can't change behaviour here.
+    """
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def _write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def build(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> dict:
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    produced = {MANIFEST}
+    for name in sorted(os.listdir(static_dir)):
+        src = os.path.join(static_dir, name)
+        if not os.path.isfile(src):
+            continue
+        stem, ext = os.path.splitext(name)
+        with open(src, "rb") as f:
+            data = f.read()
+        if ext in MINIFIERS:
+            data = MINIFIERS[ext](data.decode("utf-8")).encode("utf-8")
+
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+        manifest[name] = hashed
+        produced.add(hashed)
+        out = os.path.join(dist_dir, hashed)
+        if not os.path.exists(out):
+            _write(out, data)
+
+        if ext in COMPRESSIBLE:
+            produced.add(hashed + ".gz")
+            if not os.path.exists(out + ".gz"):
+                # mtime=0 keeps the .gz byte-identical across builds
+                _write(out + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                produced.add(hashed + ".br")
+                if not os.path.exists(out + ".br"):
+                    _write(out + ".br", brotli.compress(data, quality=11))
+
+    for name in os.listdir(dist_dir):
+        path = os.path.join(dist_dir, name)
+        if name not in produced and os.path.isfile(path):
+            os.remove(path)
+
+    with open(os.path.join(dist_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == "__main__":
+    result = build()
+    for original, hashed in result.items():
+        size = os.path.getsize(os.path.join(DIST_DIR, hashed))
+        print(f"{original:>16} -> dist/{hashed} ({size} bytes)")
+    if brotli is None:
+        print("⚠️ brotli not installed: only .gz variants were written")
@@ -0,0 +1,91 @@
+"""
+Offline image pipeline for the landing-page illustrations: writes resized
+WebP and AVIF variants at several widths to static/dist/img/ and records them
+in static/dist/img/manifest.json for the responsive_img() template helper.
+
+    python build_images.py
+
+Images whose source bytes haven't changed since the last run are skipped.
+Needs Pillow (AVIF needs Pillow >= 11.2; it is skipped on older versions).
+"""
+import hashlib
+import json
+import os
+import sys
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+IMG_DIR = os.path.join(STATIC_DIR, "dist", "img")
+MANIFEST_PATH = os.path.join(IMG_DIR, "manifest.json")
+
+# Source images and the widths we generate (never wider than the source).
+# .step-image caps them at 380px, so 1x/2x/3x of that plus a small-phone size.
+IMAGES = ("flashcard.png", "quiz.png", "tutor.png")
+WIDTHS = (320, 380, 760, 1140)
+FORMATS = {"webp": {"quality": 80, "method": 6}, "avif": {"quality": 55}}
+
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    return {}
+
+
+def _formats():
+    return [fmt for fmt in FORMATS if features.check(fmt)]
+
+
+def _encode(img, width, fmt, stem, digest):
+    height = round(img.height * width / img.width)
+    out_name = f"{stem}-{width}.{digest[:10]}.{fmt}"
+    resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+    resized.save(os.path.join(IMG_DIR, out_name), fmt.upper(), **FORMATS[fmt])
+    return [width, "dist/img/" + out_name]
+
+
+def build():
+    os.makedirs(IMG_DIR, exist_ok=True)
+    manifest = load_manifest()
+    formats = _formats()
+    for name in IMAGES:
+        src = os.path.join(STATIC_DIR, name)
+        with open(src, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        entry = manifest.get(name)
+        if entry and entry["source_hash"] == digest and sorted(entry["variants"]) == sorted(formats) and all(
+                os.path.exists(os.path.join(STATIC_DIR, path))
+                for variants in entry["variants"].values() for _, path in variants):
+            print(f"{name:>16}: unchanged")
+            continue
+
+        stem = os.path.splitext(name)[0]
+        with Image.open(src) as img:
+            img.load()
+            # Keep transparency; AVIF/WebP both handle RGBA
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            widths = [w for w in WIDTHS if w < img.width] + [min(img.width, WIDTHS[-1])]
+            widths = sorted(set(widths))
+            variants = {fmt: [_encode(img, w, fmt, stem, digest) for w in widths] for fmt in formats}
+            manifest[name] = {"source_hash": digest, "width": img.width, "height": img.height,
+                              "variants": variants}
+        print(f"{name:>16}: {len(widths)} widths x {', '.join(formats)}")
+
+    # Drop variants that no manifest entry points at any more
+    live = {os.path.basename(path) for e in manifest.values() for v in e["variants"].values() for _, path in v}
+    for file in os.listdir(IMG_DIR):
+        if file != "manifest.json" and file not in live:
+            os.remove(os.path.join(IMG_DIR, file))
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    if Image is None:
+        sys.exit("build_images.py needs Pillow (pip install pillow)")
+    build()
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Turns kept verbatim; everything older is folded into a running summary
+RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "4"))
+# Hard cap on tokens we let a single chat turn put in front of the model
+PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "1500"))
+# Summaries only run after chat traffic has been quiet for this long
+IDLE_SECONDS = float(os.getenv("CHAT_SUMMARY_IDLE_SECONDS", "2"))
+# Unsummarized turns we hold on to if the summarizer can't keep up
+MAX_PENDING_TURNS = 50
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """
+    Cheap approximation of the phi3 tokenizer: punctuation is one token and
+    words cost roughly one token per 4 characters. Cached because the same
+    summary and turns are counted again on every request.
+    """
+    if not text:
+        return 0
+    total = 0
+    for piece in re.findall(r"\w+|[^\w\s]", text):
+        total += max(1, (len(piece) + 3) // 4)
+    return total
+
+
+def _truncate_to_tokens(text: str, budget: int) -> str:
+    # Keep the tail: for summaries and pasted notes the latest part matters most
+    if budget <= 0 or not text:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    words = text.split()
+    kept = []
+    used = 0
+    for word in reversed(words):
+        cost = count_tokens(word)
+        if used + cost > budget:
+            break
+        kept.append(word)
+        used += cost
+    return " ".join(reversed(kept))
+
+
+class ChatHistory:
+    def __init__(self):
+        self.summary = ""
+        # (user, tutor) pairs that are not part of the summary yet
+        self.turns = []
+        self.lock = threading.Lock()
+
+    def add_turn(self, user: str, reply: str):
+        with self.lock:
+            self.turns.append((user, reply))
+            if len(self.turns) > MAX_PENDING_TURNS:
+                del self.turns[:len(self.turns) - MAX_PENDING_TURNS]
+
+    def needs_summary(self, recent: int = RECENT_TURNS) -> bool:
+        with self.lock:
+            return len(self.turns) > recent
+
+    def fold(self, summary: str, count: int):
+        """
+        Replace the summary and drop the `count` oldest turns it now covers.
+        """
+        with self.lock:
+            self.summary = summary
+            del self.turns[:count]
+
+
+def _format_turns(turns) -> str:
+    return "\n".join(f"Student: {u}\nTutor: {a}" for u, a in turns)
+
+
+def fits_in_context(context_len: int, prompt: str, budget: int = PROMPT_TOKEN_BUDGET) -> bool:
+    """
+    True if continuing from Ollama's stored context keeps the turn within budget.
+    """
+    return context_len > 0 and context_len + count_tokens(prompt) <= budget
+
+
+def build_prompt(history: ChatHistory, instruction: str, question: str, extra: str = "",
+                 budget: int = PROMPT_TOKEN_BUDGET, recent: int = RECENT_TURNS) -> str:
+    """
+    Build a self-contained prompt: instruction (if any; it may be sent as the
+    system prompt instead), summary of older turns, the last `recent` turns
+    verbatim, optional extra context and the new question.
+    Older material is dropped first so the result never exceeds `budget`.
+    """
+    with history.lock:
+        summary = history.summary
+        turns = list(history.turns[-recent:]) if recent else []
+
+    remaining = budget - count_tokens(instruction) - count_tokens(question)
+
+    # Most recent turns win; drop from the front until they fit
+    while turns and count_tokens(_format_turns(turns)) > remaining:
+        turns.pop(0)
+    recent_text = _format_turns(turns)
+    remaining -= count_tokens(recent_text)
+
+    summary = _truncate_to_tokens(summary, remaining)
+    remaining -= count_tokens(summary)
+    extra = _truncate_to_tokens(extra, remaining)
+
+    parts = [instruction] if instruction else []
+    if summary:
+        parts.append(f"Conversation so far (summary): {summary}")
+    if recent_text:
+        parts.append(recent_text)
+    if extra:
+        parts.append(f"Context: {extra}")
+    parts.append(f"Question: {question}")
+    return "\n".join(parts) + "\n"
+
+
+class HistorySummarizer:
+    """
+    Background worker that folds old turns into each session's summary.
+    It only calls the model once interactive chat has been idle for
+    `idle_seconds`, so summaries never compete with a student waiting on a reply.
+    """
+
+    def __init__(self, summarize_fn, idle_seconds: float = IDLE_SECONDS, recent: int = RECENT_TURNS):
+        self.summarize_fn = summarize_fn
+        self.idle_seconds = idle_seconds
+        self.recent = recent
+        self._pending = OrderedDict()
+        self._inflight = 0
+        self._last_activity = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    @contextmanager
+    def interactive(self):
+        with self._cond:
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._inflight -= 1
+                self._last_activity = time.monotonic()
+                self._cond.notify_all()
+
+    def schedule(self, history: ChatHistory):
+        if not history.needs_summary(self.recent):
+            return
+        self._ensure_thread()
+        with self._cond:
+            self._pending[id(history)] = history
+            self._cond.notify_all()
+
+    def _ensure_thread(self):
+        # Threads don't survive fork; start one per process on first use
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _wait_for_idle(self):
+        with self._cond:
+            while True:
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                quiet_for = time.monotonic() - self._last_activity
+                if self._inflight == 0 and quiet_for >= self.idle_seconds:
+                    _, history = self._pending.popitem(last=False)
+                    return history
+                self._cond.wait(timeout=max(self.idle_seconds - quiet_for, 0.05))
+
+    def _run(self):
+        while True:
+            history = self._wait_for_idle()
+            with history.lock:
+                count = len(history.turns) - self.recent
+                if count <= 0:
+                    continue
+                old_summary = history.summary
+                old_turns = _format_turns(history.turns[:count])
+            try:
+                summary = self.summarize_fn(old_summary, old_turns)
+            except Exception:
+                # Budget enforcement still holds without a summary; try again later
+                continue
+            if summary:
+                history.fold(summary.strip(), count)
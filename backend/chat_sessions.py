@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from chat_history import ChatHistory
+
+# phi3:mini runs with a 4k window by default; past that Ollama truncates anyway
+MAX_CONTEXT_TOKENS = int(os.getenv("CHAT_MAX_CONTEXT_TOKENS", "4096"))
+# How many sessions / how many context tokens in total we keep in memory
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "500"))
+MAX_TOTAL_TOKENS = int(os.getenv("CHAT_MAX_TOTAL_TOKENS", "2000000"))
+
+
+class ChatSession:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        # Ollama `context` token array returned by the last /api/generate call
+        self.context = []
+        # Verbatim recent turns + rolling summary, used when context has to be rebuilt
+        self.history = ChatHistory()
+        self.turns = 0
+        self.last_used = time.time()
+
+
+class ChatSessionStore:
+    """
+    In-memory LRU of chat sessions keyed by session ID.
+    Evicts least recently used sessions once either the session count or the
+    total number of stored context tokens goes over its cap.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, max_total_tokens: int = MAX_TOTAL_TOKENS,
+                 max_context_tokens: int = MAX_CONTEXT_TOKENS):
+        self.max_sessions = max_sessions
+        self.max_total_tokens = max_total_tokens
+        self.max_context_tokens = max_context_tokens
+        self._sessions = OrderedDict()
+        self._total_tokens = 0
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id: str = None) -> ChatSession:
+        # Only accept short, printable IDs from the client; otherwise mint a new one
+        if not session_id or len(session_id) > 64 or not session_id.isprintable():
+            session_id = uuid.uuid4().hex
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = ChatSession(session_id)
+                self._sessions[session_id] = session
+                self._evict()
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = time.time()
+            return session
+
+    def update_context(self, session: ChatSession, context):
+        """
+        Store the context array Ollama returned for the latest turn.
+        A context that has outgrown the model window is dropped so the next
+        turn starts fresh instead of being silently truncated upstream.
+        """
+        context = list(context or [])
+        if len(context) > self.max_context_tokens:
+            context = []
+        with self._lock:
+            self._total_tokens += len(context) - len(session.context)
+            session.context = context
+            session.turns += 1
+            session.last_used = time.time()
+            if session.id in self._sessions:
+                self._sessions.move_to_end(session.id)
+            self._evict()
+
+    def reset(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._total_tokens -= len(session.context)
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'context_tokens': self._total_tokens}
+
+    def _evict(self):
+        while self._sessions and (len(self._sessions) > self.max_sessions
+                                  or self._total_tokens > self.max_total_tokens):
+            _, old = self._sessions.popitem(last=False)
+            self._total_tokens -= len(old.context)
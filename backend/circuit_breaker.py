@@ -0,0 +1,138 @@
+"""
+Circuit breakers for upstream servers. When Ollama is down or wedged, callers
+get an immediate CircuitOpenError instead of each waiting out its own timeout.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# A breaker judges the last CIRCUIT_WINDOW calls once it has CIRCUIT_MIN_CALLS of them
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+# p95 time to first token above this also opens the circuit (a wedged model)
+CIRCUIT_SLOW_SECONDS = float(os.getenv("CIRCUIT_SLOW_SECONDS", "20"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "15"))
+# Consecutive good probes needed to close again
+CIRCUIT_CLOSE_AFTER = int(os.getenv("CIRCUIT_CLOSE_AFTER", "3"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and their outcomes fill a sliding window; too high a
+    failure rate or p95 latency opens the circuit. Open: calls are refused at
+    once (CircuitOpenError) for `open_seconds`. Half-open: a few probe calls are
+    let through, twice as many after each success, until `close_after` succeed
+    in a row (closed again) or one fails (open again).
+
+    Callers bracket each call with acquire() and then exactly one of
+    record(ok, latency) or release() (no verdict, e.g. the client went away).
+    """
+
+    def __init__(self, name: str, window: int = CIRCUIT_WINDOW, min_calls: int = CIRCUIT_MIN_CALLS,
+                 failure_rate: float = CIRCUIT_FAILURE_RATE, slow_seconds: float = CIRCUIT_SLOW_SECONDS,
+                 open_seconds: float = CIRCUIT_OPEN_SECONDS, close_after: int = CIRCUIT_CLOSE_AFTER):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.close_after = close_after
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (ok, latency)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        metrics.set_gauge("circuit_state", _STATE_GAUGE[CLOSED], breaker=name)
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+
+    def is_open(self) -> bool:
+        # Open and still cooling down: not even a probe would be let through
+        with self._lock:
+            return self.state == OPEN and self.retry_after() > 0
+
+    def acquire(self):
+        with self._lock:
+            if self.state == OPEN:
+                if self.retry_after() > 0:
+                    metrics.inc("circuit_rejected", breaker=self.name)
+                    raise CircuitOpenError(self.name, self.retry_after())
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probes >= 2 ** self._probe_successes:
+                    metrics.inc("circuit_rejected", breaker=self.name)
+                    raise CircuitOpenError(self.name, 1.0)
+                self._probes += 1
+
+    def release(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def record(self, ok: bool, latency: float):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                if not ok or latency > self.slow_seconds:
+                    self._transition(OPEN)
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.close_after:
+                        self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                return  # a call that started before the circuit opened
+            self._outcomes.append((ok, latency))
+            if len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for good, _ in self._outcomes if not good)
+            if failures / len(self._outcomes) >= self.failure_rate or self._p95() > self.slow_seconds:
+                self._transition(OPEN)
+
+    def _p95(self) -> float:
+        # Of the calls that worked (failures already count towards the error rate), nearest rank
+        latencies = sorted(latency for good, latency in self._outcomes if good)
+        if len(latencies) < self.min_calls:
+            return 0.0
+        return latencies[math.ceil(0.95 * len(latencies)) - 1]
+
+    def _transition(self, state):
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        self._probes = 0
+        self._probe_successes = 0
+        self._outcomes.clear()
+        metrics.inc("circuit_transitions", breaker=self.name, to=state)
+        metrics.set_gauge("circuit_state", _STATE_GAUGE[state], breaker=self.name)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    """
+    The process-wide breaker for an upstream (e.g. an Ollama base URL).
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
@@ -0,0 +1,157 @@
+"""
+WSGI middleware that compresses API responses (brotli or gzip, whichever the
+client prefers) when they are worth it: text-like content types, bodies of at
+least COMPRESS_MIN_BYTES, and nothing compressed upstream already (static
+files and cached pages come precompressed and are passed through untouched).
+
+Buffered responses are compressed in one go. Streaming responses (no
+Content-Length) are compressed incrementally; for SSE and NDJSON every chunk
+the app yields is flushed straight away so each event reaches the client
+without waiting for the rest of the stream.
+"""
+import os
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Dynamic compression runs per request: mid levels give nearly all of the
+# size win for a fraction of the CPU of gzip 9 / brotli 11 (bench/bench_compression.py)
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "text/event-stream",
+                      "text/csv", "text/tab-separated-values", "text/plain", "text/html"}
+# Streams whose chunks are messages: flushed one by one
+FLUSH_PER_CHUNK = {"text/event-stream", "application/x-ndjson"}
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits=31: gzip container
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._z.compress(data)
+
+    def flush(self):
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._c.process(data)
+
+    def flush(self):
+        return self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+def _compressor(encoding):
+    return _Brotli(BROTLI_QUALITY) if encoding == "br" else _Gzip(GZIP_LEVEL)
+
+
+def negotiate(accept_encoding):
+    accepted = parse_accept_header(accept_encoding or "")
+    if brotli is not None and accepted["br"] > 0:
+        return "br"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    def __init__(self, wsgi_app, min_size=COMPRESS_MIN_BYTES):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate(environ.get("HTTP_ACCEPT_ENCODING"))
+        if encoding is None or environ["REQUEST_METHOD"] == "HEAD":
+            return self.wsgi_app(environ, start_response)
+
+        plan = {}
+
+        def _start_response(status, headers, exc_info=None):
+            names = {name.lower(): value for name, value in headers}
+            mimetype = names.get("content-type", "").split(";")[0].strip()
+            length = names.get("content-length")
+            if (status.startswith("200") and mimetype in COMPRESSIBLE_TYPES
+                    and "content-encoding" not in names
+                    and (length is None or int(length) >= self.min_size)):
+                plan["stream"] = length is None
+                plan["flush"] = mimetype in FLUSH_PER_CHUNK
+                headers = [(name, _weak(value) if name.lower() == "etag" else value)
+                           for name, value in headers if name.lower() not in ("content-length", "vary")]
+                vary = [v.strip() for v in names.get("vary", "").split(",") if v.strip()]
+                headers.append(("Vary", ", ".join(vary + ["Accept-Encoding"])))
+                headers.append(("Content-Encoding", encoding))
+                plan["headers"] = (status, headers, exc_info)
+                # Buffered responses get their final Content-Length later
+                if plan["stream"]:
+                    return start_response(status, headers, exc_info)
+                return None
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.wsgi_app(environ, _start_response)
+        if not plan:
+            return app_iter
+        if plan["stream"]:
+            return _ClosingIterator(self._stream(app_iter, encoding, plan["flush"]), app_iter)
+
+        try:
+            body = b"".join(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        compressor = _compressor(encoding)
+        data = compressor.compress(body) + compressor.finish()
+        status, headers, exc_info = plan["headers"]
+        start_response(status, headers + [("Content-Length", str(len(data)))], exc_info)
+        return [data]
+
+    @staticmethod
+    def _stream(app_iter, encoding, flush):
+        compressor = _compressor(encoding)
+        for chunk in app_iter:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            data = compressor.compress(chunk)
+            if flush:
+                data += compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class _ClosingIterator:
+    # Keeps close() reaching the app's iterator, e.g. to abort an upstream stream
+    def __init__(self, iterable, app_iter):
+        self._iterable = iterable
+        self._app_iter = app_iter
+
+    def __iter__(self):
+        return self._iterable
+
+    def close(self):
+        self._iterable.close()
+        if hasattr(self._app_iter, "close"):
+            self._app_iter.close()
+
+
+def _weak(etag):
+    # The compressed bytes differ from the identity ones, so only a weak validator still holds
+    return etag if etag.startswith("W/") else "W/" + etag
@@ -0,0 +1,81 @@
+"""
+CORS for /api/* as WSGI middleware, replacing flask_cors.
+
+The origin allowlist (CORS_ORIGINS, comma separated) is compiled once at
+start-up: exact origins go in a set and wildcard entries such as
+"https://*.example.edu" or "http://localhost:*" become one regex. Preflight
+requests are answered right here, without entering Flask's routing, and carry
+a long Access-Control-Max-Age so browsers skip them on later requests.
+"""
+import os
+import re
+
+# The dashboard is served same-origin and needs no CORS; this covers local dev front-ends
+DEFAULT_ORIGINS = "http://localhost:*,http://127.0.0.1:*"
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "86400"))
+ALLOWED_METHODS = "GET, POST, DELETE, OPTIONS"
+# Response headers cross-origin scripts may read beyond the CORS-safelisted ones:
+# when to retry a 503, deck validators, export file names
+EXPOSED_HEADERS = "Retry-After, ETag, Content-Disposition"
+
+
+class OriginPolicy:
+    def __init__(self, spec: str):
+        entries = [entry.strip().rstrip("/") for entry in spec.split(",") if entry.strip()]
+        self.allow_all = "*" in entries
+        self.exact = {entry for entry in entries if "*" not in entry}
+        patterns = [re.escape(entry).replace(r"\*", r"[^/]+") for entry in entries if "*" in entry and entry != "*"]
+        self.pattern = re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+
+    def allows(self, origin: str) -> bool:
+        return self.allow_all or origin in self.exact or (
+            self.pattern is not None and self.pattern.fullmatch(origin) is not None)
+
+    def header_value(self, origin: str) -> str:
+        # Echo the origin (with Vary: Origin) unless everything is allowed
+        return "*" if self.allow_all else origin
+
+
+class CorsMiddleware:
+    def __init__(self, wsgi_app, origins: str = None, prefix: str = "/api/"):
+        self.wsgi_app = wsgi_app
+        self.policy = OriginPolicy(origins if origins is not None else os.getenv("CORS_ORIGINS", DEFAULT_ORIGINS))
+        self.prefix = prefix
+
+    def __call__(self, environ, start_response):
+        if not environ.get("PATH_INFO", "").startswith(self.prefix):
+            return self.wsgi_app(environ, start_response)
+
+        origin = environ.get("HTTP_ORIGIN")
+        allowed = bool(origin) and self.policy.allows(origin)
+        if origin and environ["REQUEST_METHOD"] == "OPTIONS" and "HTTP_ACCESS_CONTROL_REQUEST_METHOD" in environ:
+            headers = [("Vary", "Origin"), ("Content-Length", "0")]
+            if allowed:
+                headers += [
+                    ("Access-Control-Allow-Origin", self.policy.header_value(origin)),
+                    ("Access-Control-Allow-Methods", ALLOWED_METHODS),
+                    ("Access-Control-Max-Age", str(CORS_MAX_AGE)),
+                ]
+                requested = environ.get("HTTP_ACCESS_CONTROL_REQUEST_HEADERS")
+                if requested:
+                    headers.append(("Access-Control-Allow-Headers", requested))
+            start_response("204 No Content", headers)
+            return [b""]
+
+        # Unless every origin gets the same answer, every response varies by Origin, even one
+        # without CORS headers: a shared cache must not hand a same-origin (or refused)
+        # response to an allowed cross-origin client, e.g. an immutable deck.
+        if not allowed and self.policy.allow_all:
+            return self.wsgi_app(environ, start_response)
+
+        def _start_response(status, headers, exc_info=None):
+            if not self.policy.allow_all:
+                vary = [value for name, value in headers if name.lower() == "vary"]
+                headers = [(name, value) for name, value in headers if name.lower() != "vary"]
+                headers.append(("Vary", ", ".join(vary + ["Origin"])))
+            if allowed:
+                headers.append(("Access-Control-Allow-Origin", self.policy.header_value(origin)))
+                headers.append(("Access-Control-Expose-Headers", EXPOSED_HEADERS))
+            return start_response(status, headers, exc_info)
+
+        return self.wsgi_app(environ, _start_response)
@@ -0,0 +1,48 @@
+"""
+Per-request deadlines. A client states how long it is prepared to wait in the
+X-Deadline-Ms header; that budget travels with the request through the
+scheduler to the upstream generation. Generations are consumed as a stream,
+so whatever was produced before the deadline can still be returned.
+"""
+import os
+import time
+
+DEADLINE_HEADER = "X-Deadline-Ms"
+# Upper bound on what a client may ask for
+MAX_DEADLINE_SECONDS = float(os.getenv("MAX_DEADLINE_SECONDS", "120"))
+
+
+class DeadlineExceeded(Exception):
+    """
+    The deadline passed before the generation finished. `text` is what the
+    model had produced by then (possibly empty).
+    """
+
+    def __init__(self, text: str = "", tokens: int = 0):
+        super().__init__(f"deadline exceeded after {tokens} tokens")
+        self.text = text
+        self.tokens = tokens
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_headers(cls, headers, default: float) -> "Deadline":
+        try:
+            seconds = float(headers.get(DEADLINE_HEADER)) / 1000.0
+        except (TypeError, ValueError):
+            seconds = default
+        return cls(min(max(seconds, 0.0), MAX_DEADLINE_SECONDS))
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, cap: float = None) -> float:
+        # For socket/future timeouts, which treat 0 as "don't wait" or "non-blocking"
+        remaining = max(self.remaining(), 0.001)
+        return min(remaining, cap) if cap is not None else remaining
@@ -0,0 +1,47 @@
+"""
+Noticing that the HTTP client went away while we are still generating for it.
+
+Streaming responses find out for free: the server's next write fails and it
+closes our response iterator. Buffered routes never write until the end, so
+DisconnectWatch peeks at the client socket instead; a peer that has closed
+the connection reads as EOF.
+"""
+import select
+import socket
+import time
+
+CHECK_INTERVAL = 0.25
+
+
+def client_socket(environ):
+    # gunicorn and the Werkzeug dev server both expose the connection
+    return environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+
+
+class DisconnectWatch:
+    """
+    Callable for stream_generate(should_stop=...): true once the client has
+    closed its connection. The socket is checked at most every `interval` seconds.
+    """
+
+    def __init__(self, environ, interval: float = CHECK_INTERVAL):
+        self.sock = client_socket(environ)
+        self.interval = interval
+        self.disconnected = False
+        self._next_check = 0.0
+
+    def __call__(self) -> bool:
+        if self.sock is None or self.disconnected:
+            return self.disconnected
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.interval
+        try:
+            # select() first: a socket with a timeout would otherwise block in recv()
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if readable:
+                self.disconnected = self.sock.recv(1, socket.MSG_PEEK) == b""
+        except (OSError, ValueError):
+            self.disconnected = True
+        return self.disconnected
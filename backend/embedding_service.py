@@ -0,0 +1,174 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+# Texts sent per upstream call, how long to wait for a batch to fill up,
+# and how many upstream calls may run at once
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+# Vectors kept in memory in front of the on-disk cache
+EMBED_MEMORY_CACHE = 10000
+
+
+class EmbeddingService:
+    """
+    Batching, de-duplicating, caching front for an embedding backend.
+
+    `embed_batch_fn(texts) -> list of vectors` does the actual upstream call.
+    Texts are keyed by a content hash: repeats are served from an in-memory LRU
+    or the SQLite cache on disk, and identical texts requested concurrently
+    share one pending upstream slot. Misses are grouped into batches of up to
+    `batch_size` and at most `concurrency` upstream calls run at a time.
+    """
+
+    def __init__(self, embed_batch_fn, cache_path: str, model: str = "",
+                 batch_size: int = EMBED_BATCH_SIZE, max_wait_ms: float = EMBED_BATCH_WAIT_MS,
+                 concurrency: int = EMBED_CONCURRENCY):
+        self.embed_batch_fn = embed_batch_fn
+        self.model = model
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.concurrency = concurrency
+        self.stats = {'requested': 0, 'cache_hits': 0, 'deduped': 0, 'embedded': 0, 'upstream_calls': 0}
+
+        self.cache_path = cache_path
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.reopen()
+        self._db.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        self._db_lock = threading.Lock()
+        self._memory = OrderedDict()
+
+        self._pending = OrderedDict()
+        # key -> Future for texts already handed to an upstream call
+        self._inflight = {}
+        self._cond = threading.Condition()
+        self._pool = None
+        self._thread = None
+        self._pid = None
+
+    def reopen(self):
+        # Also used after fork(): SQLite handles must not be shared with the parent
+        self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+
+    def embed(self, text: str):
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts):
+        """
+        Vectors (float32 arrays) for `texts`, in order.
+        """
+        keys = [self._key(t) for t in texts]
+        results = {}
+        futures = {}
+        with self._cond:
+            self.stats['requested'] += len(texts)
+        for key, text in zip(keys, texts):
+            if key in results or key in futures:
+                with self._cond:
+                    self.stats['deduped'] += 1
+                continue
+            vec = self._cached(key)
+            if vec is not None:
+                results[key] = vec
+                with self._cond:
+                    self.stats['cache_hits'] += 1
+                continue
+            futures[key] = self._submit(key, text)
+        for key, future in futures.items():
+            results[key] = future.result()
+        return [results[k] for k in keys]
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str):
+        with self._db_lock:
+            vec = self._memory.get(key)
+            if vec is not None:
+                self._memory.move_to_end(key)
+                return vec
+            row = self._db.execute("SELECT vec FROM vectors WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vec = np.frombuffer(row[0], dtype=np.float32)
+        self._remember(key, vec)
+        return vec
+
+    def _remember(self, key, vec):
+        with self._db_lock:
+            self._memory[key] = vec
+            self._memory.move_to_end(key)
+            while len(self._memory) > EMBED_MEMORY_CACHE:
+                self._memory.popitem(last=False)
+
+    def _submit(self, key: str, text: str) -> Future:
+        self._ensure_started()
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is not None or key in self._inflight:
+                # Same text already queued or being embedded for another request
+                self.stats['deduped'] += 1
+                return entry[1] if entry is not None else self._inflight[key]
+            future = Future()
+            self._pending[key] = (text, future)
+            self._cond.notify()
+            return future
+
+    def _ensure_started(self):
+        # Threads don't survive fork; start them per process on first use
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+                self._slots = threading.BoundedSemaphore(self.concurrency)
+                self._thread = threading.Thread(target=self._dispatch, daemon=True)
+                self._thread.start()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Give a partial batch a moment to fill up
+                if len(self._pending) < self.batch_size:
+                    self._cond.wait(timeout=self.max_wait)
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    key, (text, future) = self._pending.popitem(last=False)
+                    self._inflight[key] = future
+                    batch.append((key, text, future))
+            self._slots.acquire()
+            self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        try:
+            vectors = self.embed_batch_fn([text for _, text, _ in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Expected {len(batch)} embeddings, got {len(vectors)}")
+            with self._cond:
+                self.stats['upstream_calls'] += 1
+                self.stats['embedded'] += len(batch)
+            rows = []
+            for (key, _, future), vec in zip(batch, vectors):
+                vec = np.asarray(vec, dtype=np.float32)
+                self._remember(key, vec)
+                rows.append((key, vec.tobytes()))
+                future.set_result(vec)
+            with self._db_lock, self._db:
+                self._db.executemany("INSERT OR REPLACE INTO vectors (key, vec) VALUES (?, ?)", rows)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._cond:
+                for key, _, _ in batch:
+                    self._inflight.pop(key, None)
+            self._slots.release()
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within one process
+    fcntl = None
+
+# Rows converted per step when searching a float16 store (sized to stay in cache)
+SEARCH_BLOCK_ROWS = 4096
+
+
+def hashed_embedding(text: str, dim: int = 256):
+    """
+    Deterministic local stand-in for a real embedding model (feature hashing of
+    lowercase word tokens). Good enough for tests and offline development.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    for token in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) else -1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class EmbeddingStore:
+    """
+    Append-only matrix of L2-normalised embeddings kept in a raw file and read
+    through `np.memmap`, with row IDs in a sidecar text file.
+
+    Files (for prefix `p`): `p.vec` (rows, float32 or float16), `p.ids` (one ID
+    per line), `p.del` (tombstones, one `ID<TAB>rows` per line) and `p.json`
+    (dim/dtype). The matrix is mapped read-only, so every worker process shares
+    the same page-cache pages instead of loading its own copy; appends just
+    extend the files and readers remap when they grow.
+
+    Row i belongs to the i-th ID. Writers add vectors before their IDs, so a
+    reader only trusts rows that have an ID, and the next writer trims whatever
+    a crashed one left behind before appending.
+    """
+
+    def __init__(self, prefix: str, dim: int, dtype: str = "float32"):
+        self.prefix = prefix
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        meta_path = prefix + ".json"
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            dim, dtype = meta["dim"], meta["dtype"]
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim, "dtype": dtype}, f)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._row_bytes = self.dim * self.dtype.itemsize
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._mapped_rows = 0
+        self._ids = []
+        self._ids_offset = 0
+        self._rows_by_id = {}
+        self._tombstones = []
+        self._tombstones_offset = 0
+        self._hidden = np.empty(0, dtype=np.int64)
+        for path in (prefix + ".vec", prefix + ".ids", prefix + ".del"):
+            open(path, "ab").close()
+
+    def __len__(self):
+        return self._refresh()[0].shape[0]
+
+    def append(self, ids, vectors):
+        """
+        Add rows without rewriting existing data. IDs must not contain newlines.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(ids) != vectors.shape[0]:
+            raise ValueError("ids and vectors must have the same length")
+        if not len(ids):
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.where(norms == 0, 1, norms)).astype(self.dtype)
+
+        with self._lock, open(self.prefix + ".vec", "a+b") as vec_file, \
+                open(self.prefix + ".ids", "a+b") as id_file:
+            if fcntl:
+                fcntl.flock(vec_file, fcntl.LOCK_EX)
+            try:
+                self._trim(vec_file, id_file)
+                # Vectors first: a row only counts once its ID is written
+                vec_file.write(vectors.tobytes())
+                vec_file.flush()
+                id_file.write("".join(f"{i}\n" for i in ids).encode("utf-8"))
+                id_file.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(vec_file, fcntl.LOCK_UN)
+
+    def remove(self, ids):
+        """
+        Hide the rows stored so far under `ids` from search. Rows appended later
+        under the same ID (e.g. a reused row ID) stay visible.
+        """
+        if not len(ids):
+            return
+        with self._lock, open(self.prefix + ".vec", "a+b") as vec_file, \
+                open(self.prefix + ".ids", "a+b") as id_file, \
+                open(self.prefix + ".del", "a", encoding="utf-8") as del_file:
+            if fcntl:
+                fcntl.flock(vec_file, fcntl.LOCK_EX)
+            try:
+                rows = self._trim(vec_file, id_file)
+                del_file.write("".join(f"{i}\t{rows}\n" for i in ids))
+                del_file.flush()
+            finally:
+                if fcntl:
+                    fcntl.flock(vec_file, fcntl.LOCK_UN)
+
+    def _trim(self, vec_file, id_file) -> int:
+        # Cut both files back to the rows that have a vector and an ID, dropping
+        # what a writer that died mid-append left (a torn row, orphan vectors or IDs)
+        id_file.seek(0)
+        data = id_file.read()
+        rows = min(data.count(b"\n"), vec_file.seek(0, os.SEEK_END) // self._row_bytes)
+        end = 0
+        for _ in range(rows):
+            end = data.index(b"\n", end) + 1
+        if len(data) > end:
+            id_file.truncate(end)
+        if vec_file.tell() > rows * self._row_bytes:
+            vec_file.truncate(rows * self._row_bytes)
+        return rows
+
+    def search(self, query, k: int = 5):
+        """
+        Top-k (id, cosine score) pairs for a query vector: one vectorised dot
+        product over the mapped matrix plus `argpartition`.
+        """
+        matrix, ids = self._refresh()
+        n = matrix.shape[0]
+        if not n or k <= 0:
+            return []
+        hidden = self._hidden
+        q = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        if self.dtype == np.float32:
+            scores = matrix @ q
+        else:
+            # No BLAS for float16: upcast block by block into one reused buffer.
+            # Half the page cache of float32, but the conversion costs CPU per query.
+            scores = np.empty(n, dtype=np.float32)
+            buf = np.empty((min(n, SEARCH_BLOCK_ROWS), self.dim), dtype=np.float32)
+            for start in range(0, n, SEARCH_BLOCK_ROWS):
+                block = matrix[start:start + SEARCH_BLOCK_ROWS]
+                np.copyto(buf[:len(block)], block)
+                scores[start:start + len(block)] = buf[:len(block)] @ q
+        scores[hidden[hidden < n]] = -np.inf
+        if k < n:
+            top = np.argpartition(scores, n - k)[n - k:]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(ids[i], float(scores[i])) for i in top if scores[i] > -np.inf]
+
+    def _refresh(self):
+        with self._lock:
+            rows = os.path.getsize(self.prefix + ".vec") // self._row_bytes
+            tombstones, size = self._read_lines(".del", self._tombstones_offset)
+            if tombstones:
+                self._tombstones_offset += size
+                self._tombstones.extend((i, int(bound)) for i, bound in (t.split("\t") for t in tombstones))
+            if rows != self._mapped_rows or self._matrix is None or tombstones:
+                # No further than the vectors: IDs past them are a crashed writer's leftovers
+                new_ids, _ = self._read_lines(".ids", self._ids_offset)
+                for i in new_ids[:max(0, rows - len(self._ids))]:
+                    self._ids_offset += len(i.encode("utf-8")) + 1
+                    self._rows_by_id.setdefault(i, []).append(len(self._ids))
+                    self._ids.append(i)
+                rows = min(rows, len(self._ids))
+                self._hidden = np.array([row for i, bound in self._tombstones
+                                         for row in self._rows_by_id.get(i, ()) if row < bound], dtype=np.int64)
+                if rows:
+                    self._matrix = np.memmap(self.prefix + ".vec", dtype=self.dtype, mode="r",
+                                             shape=(rows, self.dim))
+                else:
+                    self._matrix = np.empty((0, self.dim), dtype=self.dtype)
+                self._mapped_rows = rows
+            return self._matrix, self._ids
+
+    def _read_lines(self, suffix, offset):
+        # Complete lines after `offset` and their size in bytes; a writer may be mid-append
+        with open(self.prefix + suffix, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+        complete = tail[:tail.rfind(b"\n") + 1]
+        return complete.decode("utf-8").split("\n")[:-1], len(complete)
@@ -0,0 +1,148 @@
+"""
+Hedged generations. If the host serving a request has not produced its first
+token within the recent p95 time to first token, the same request is sent to
+a second host; whichever streams first is kept and the other is cancelled.
+A credit budget caps hedges at HEDGE_BUDGET of requests, so a slow pool
+isn't handed extra load.
+"""
+import math
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+import metrics
+
+# Hedges per request, on average (credit earned per request; a hedge costs 1)
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+HEDGE_MAX_CREDIT = 3.0
+# TTFT samples the p95 is taken over, and how many are needed before hedging at all
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+
+
+class HedgePolicy:
+    def __init__(self, route: str, budget: float = HEDGE_BUDGET):
+        self.route = route
+        self.budget = budget
+        self._ttfts = deque(maxlen=HEDGE_WINDOW)
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def record_ttft(self, seconds: float):
+        with self._lock:
+            self._ttfts.append(seconds)
+        delay = self.delay()
+        if delay is not None:
+            metrics.set_gauge("ttft_p95_seconds", round(delay, 4), route=self.route)
+
+    def delay(self):
+        # Current p95 time to first token, or None while there are too few samples
+        with self._lock:
+            if len(self._ttfts) < HEDGE_MIN_SAMPLES:
+                return None
+            ttfts = sorted(self._ttfts)
+        return max(HEDGE_MIN_DELAY, ttfts[math.ceil(0.95 * len(ttfts)) - 1])
+
+    def earn(self):
+        with self._lock:
+            self._credit = min(HEDGE_MAX_CREDIT, self._credit + self.budget)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            return True
+
+
+class _Attempt:
+    def __init__(self):
+        self.host = None
+        self.cancelled = threading.Event()
+        self.ended = False
+
+
+def hedged(launch, policy: HedgePolicy, should_stop=None):
+    """
+    Yield the chunks of whichever attempt streams first.
+
+    `launch(exclude, on_host, should_stop)` starts one attempt: an iterator of
+    chunks from a host not in `exclude`, reporting the host it picked through
+    `on_host`. Attempts run on their own threads. A cancelled loser stops at its
+    next chunk, which closes its upstream connection; one that never answers
+    holds its host until its own timeout.
+    """
+    policy.earn()
+    events = queue.Queue()
+    attempts = []
+
+    def start(exclude):
+        attempt = _Attempt()
+        attempts.append(attempt)
+
+        def stop():
+            return attempt.cancelled.is_set() or (should_stop is not None and should_stop())
+
+        def run():
+            try:
+                for chunk in launch(exclude, lambda host: setattr(attempt, "host", host), stop):
+                    events.put((attempt, chunk, None))
+                events.put((attempt, None, None))
+            except BaseException as e:
+                events.put((attempt, None, e))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    started = time.monotonic()
+    delay = policy.delay()
+    winner = None
+    error = None
+    start(())
+    try:
+        while True:
+            timeout = None
+            if winner is None and delay is not None:
+                timeout = max(0.0, started + delay - time.monotonic())
+            try:
+                attempt, chunk, failure = events.get(timeout=timeout)
+            except queue.Empty:
+                delay = None
+                if policy.spend():
+                    metrics.inc("hedge_sent", route=policy.route)
+                    start({a.host for a in attempts if a.host is not None})
+                else:
+                    metrics.inc("hedge_skipped", route=policy.route)
+                continue
+
+            if winner is None:
+                if chunk is None:
+                    # Ended without a token: wait for the other attempt, if there is one.
+                    # (A first attempt that fails outright isn't hedged: that would be a retry.)
+                    attempt.ended = True
+                    error = error or failure
+                    if all(a.ended for a in attempts):
+                        if error is not None:
+                            raise error
+                        return
+                    continue
+                winner = attempt
+                policy.record_ttft(time.monotonic() - started)
+                if attempt is not attempts[0]:
+                    metrics.inc("hedge_won", route=policy.route)
+                for other in attempts:
+                    if other is not winner:
+                        other.cancelled.set()
+
+            if attempt is not winner:
+                continue
+            if failure is not None:
+                raise failure
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        for attempt in attempts:
+            attempt.cancelled.set()
@@ -0,0 +1,62 @@
+"""
+JSON encoding for everything the app emits or parses: API responses, request
+bodies sent to Ollama and the NDJSON chunks Ollama streams back.
+
+orjson is used when it is installed and the stdlib json module otherwise;
+JSON_CODEC=stdlib forces the fallback. Both produce compact UTF-8 without
+sorting keys, so switching codecs doesn't change what clients receive.
+"""
+import json
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.getenv("JSON_CODEC", "orjson") == "stdlib":
+    orjson = None
+
+CODEC = "orjson" if orjson is not None else "stdlib"
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+if orjson is not None:
+    def dumps(obj, default=None) -> bytes:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+
+    loads = orjson.loads
+else:
+    def dumps(obj, default=None) -> bytes:
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    loads = json.loads
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by the codec above (jsonify, request.json).
+    Calls with extra json.dumps options, and pretty-printing in debug mode,
+    go through Flask's stdlib implementation.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default), mimetype=self.mimetype)
+
+
+def init_json(app):
+    app.json = CodecJSONProvider(app)
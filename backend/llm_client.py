@@ -3,12 +3,28 @@ import re
 import requests
 from requests.exceptions import RequestException
 import os
+import time
 from dotenv import load_dotenv
 
+from circuit_breaker import breaker_for
+from json_codec import JSON_HEADERS, dumps, loads
+from prompts import render
+
 load_dotenv()
 
-# Use the port where Ollama is actually running
+# Use the port where Ollama is actually running. The app itself goes through
+# ollama_pool (OLLAMA_HOSTS); these are the defaults for direct calls.
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434/api/generate")
+OLLAMA_EMBED_URL = os.getenv("OLLAMA_EMBED_URL", OLLAMA_URL.rsplit("/api/", 1)[0] + "/api/embeddings")
+# Batch endpoint (Ollama >= 0.3): one request, many inputs
+OLLAMA_EMBED_BATCH_URL = os.getenv("OLLAMA_EMBED_BATCH_URL", OLLAMA_URL.rsplit("/api/", 1)[0] + "/api/embed")
+EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+
+def post_json(url: str, payload, **kwargs):
+    """
+    requests.post(url, json=payload) encoded with the app's JSON codec.
+    """
+    return requests.post(url, data=dumps(payload), headers=JSON_HEADERS, **kwargs)
 
 def _extract_text_from_json(data):
     if not data:
@@ -95,16 +111,12 @@ def _format_as_bullets(text: str, max_sentences_per_bullet: int = 2) -> str:
 
     return "\n\n".join(bullets)
 
-def _wrap_prompt_with_bullet_instruction(prompt: str) -> str:
+def _bullet_prompt_fields(prompt: str) -> dict:
     """
-    Prepend a short instruction that makes the model answer in bullet points.
+    Prompt fields that make the model answer in bullet points: the instruction
+    goes in `system`, ahead of the query, so it is a prefix Ollama can reuse.
     """
-    instruction = (
-        "You are a helpful assistant. Answer the user's query as a clear bullet-point list.\n"
-        "For each bullet: start with the key point in bold (use ** **), then give 1-2 short lines of explanation.\n"
-        "Keep bullets concise and use at most 3-5 main bullet points.\n\n"
-    )
-    return instruction + prompt
+    return render("bullets", query=prompt)
 
 def generate_from_ollama(prompt: str, model: str = "phi3:mini", timeout: int = 120, force_bullets: bool = True):
     """
@@ -112,23 +124,23 @@ def generate_from_ollama(prompt: str, model: str = "phi3:mini", timeout: int = 1
     - force_bullets: if True, the prompt will be wrapped with an instruction to respond in bullet points.
     """
     # If requested, wrap the prompt with an instruction asking for bullet points
-    prompt_to_send = _wrap_prompt_with_bullet_instruction(prompt) if force_bullets else prompt
+    prompt_fields = _bullet_prompt_fields(prompt) if force_bullets else {"prompt": prompt}
 
     payload = {
         "model": model,
-        "prompt": prompt_to_send,
+        **prompt_fields,
         "stream": False
     }
     
     try:
-        resp = requests.post(OLLAMA_URL, json=payload, timeout=timeout)
+        resp = post_json(OLLAMA_URL, payload, timeout=timeout)
         resp.raise_for_status()
     except RequestException as e:
         raise RuntimeError(f"Ollama request failed: {e}")
 
     # Try the simple single-JSON case
     try:
-        data = resp.json()
+        data = loads(resp.content)
         extracted = _extract_text_from_json(data)
         if extracted:
             text = _normalize_joined_text(extracted)
@@ -146,7 +158,7 @@ def generate_from_ollama(prompt: str, model: str = "phi3:mini", timeout: int = 1
         pieces = []
         for line in lines:
             try:
-                j = json.loads(line)
+                j = loads(line)
             except Exception:
                 # not JSON — treat entire line as text
                 pieces.append(line)
@@ -166,4 +178,141 @@ def generate_from_ollama(prompt: str, model: str = "phi3:mini", timeout: int = 1
         # join fragments exactly (no extra spaces): preserves tokens like "Mem" + "o"
         joined = "".join(pieces)
         joined = _normalize_joined_text(joined)
-        return _format_as_bullets(joined) if force_bullets else joined
\ No newline at end of file
+        return _format_as_bullets(joined) if force_bullets else joined
+
+def _post_embed(url: str, payload: dict, timeout: float):
+    """
+    One embeddings call through the server's circuit breaker, judged like a
+    generation (see stream_generate). Non-200 answers raise requests.HTTPError.
+    """
+    breaker = breaker_for(upstream_of(url))
+    breaker.acquire()
+    started = time.monotonic()
+    verdict = None
+    try:
+        resp = post_json(url, payload, timeout=timeout)
+        if resp.status_code >= 500:
+            verdict = False
+        elif resp.status_code == 200:
+            verdict = True
+        resp.raise_for_status()
+        return resp
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        if not isinstance(e, requests.exceptions.Timeout) or timeout >= breaker.slow_seconds:
+            verdict = False
+        raise
+    finally:
+        if verdict is None:
+            breaker.release()
+        else:
+            breaker.record(verdict, time.monotonic() - started)
+
+def embed_from_ollama(text: str, model: str = EMBED_MODEL, timeout: int = 30, host: str = None):
+    """
+    Get one embedding vector (list of floats) from Ollama's /api/embeddings
+    on `host` (a base URL; default OLLAMA_EMBED_URL).
+    """
+    url = f"{host}/api/embeddings" if host else OLLAMA_EMBED_URL
+    resp = _post_embed(url, {"model": model, "prompt": text}, timeout)
+    embedding = loads(resp.content).get("embedding")
+    if not embedding:
+        raise RuntimeError("Ollama returned no embedding")
+    return embedding
+
+def embed_batch_from_ollama(texts, model: str = EMBED_MODEL, timeout: int = 60, host: str = None):
+    """
+    Embed several texts in one call via /api/embed on `host` (a base URL;
+    default OLLAMA_EMBED_BATCH_URL). Falls back to one /api/embeddings call
+    per text on servers without it.
+    """
+    url = f"{host}/api/embed" if host else OLLAMA_EMBED_BATCH_URL
+    try:
+        resp = _post_embed(url, {"model": model, "input": list(texts)}, timeout)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+        return [embed_from_ollama(t, model, timeout, host) for t in texts]
+    embeddings = loads(resp.content).get("embeddings")
+    if not embeddings or len(embeddings) != len(texts):
+        raise RuntimeError("Ollama returned the wrong number of embeddings")
+    return embeddings
+
+class GenerationCancelled(Exception):
+    """
+    Raised by stream_generate when the caller asked it to stop early.
+    `tokens` is how many chunks had already been produced.
+    """
+
+    def __init__(self, tokens: int = 0):
+        super().__init__(f"generation cancelled after {tokens} tokens")
+        self.tokens = tokens
+
+
+def upstream_of(url: str) -> str:
+    # Breakers are per Ollama server, not per endpoint
+    return url.rsplit("/api/", 1)[0]
+
+
+def stream_generate(payload: dict, url: str = None, timeout: int = 120, should_stop=None):
+    """
+    Yield the JSON chunks of a streaming /api/generate call.
+    If `should_stop()` becomes true the connection is closed, which makes
+    Ollama abort the generation, and GenerationCancelled is raised.
+    Non-200 answers raise requests.HTTPError.
+
+    Calls go through the server's circuit breaker: while it is open this raises
+    CircuitOpenError without touching the network. The breaker judges a call by
+    its time to first token; connection errors, 5xx answers and timeouts at
+    least as long as its slow-call threshold count as failures.
+    """
+    url = url or OLLAMA_URL
+    breaker = breaker_for(upstream_of(url))
+    breaker.acquire()
+    started = time.monotonic()
+    verdict = None
+    resp = None
+    tokens = 0
+    try:
+        resp = post_json(url, dict(payload, stream=True), stream=True, timeout=timeout)
+        if resp.status_code >= 500:
+            verdict = False
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if should_stop is not None and should_stop():
+                raise GenerationCancelled(tokens)
+            if not line:
+                continue
+            chunk = loads(line)
+            if verdict is None:
+                verdict = True
+                breaker.record(True, time.monotonic() - started)
+            tokens += 1
+            yield chunk
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        # (requests reports a read timeout mid-stream as a ConnectionError.)
+        # Running out a caller's short deadline says nothing about the server's health.
+        timed_out = isinstance(e, requests.exceptions.Timeout) or time.monotonic() - started >= timeout
+        if verdict is None and (not timed_out or timeout >= breaker.slow_seconds):
+            verdict = False
+        raise
+    finally:
+        if verdict is False:
+            breaker.record(False, time.monotonic() - started)
+        elif verdict is None:
+            breaker.release()
+        if resp is not None:
+            resp.close()
+
+
+def collect_generation(chunks):
+    """
+    Join streamed chunks into (text, final_chunk); the final chunk carries
+    Ollama's context array and timings.
+    """
+    pieces = []
+    final = {}
+    for chunk in chunks:
+        pieces.append(chunk.get("response", ""))
+        if chunk.get("done"):
+            final = chunk
+    return "".join(pieces), final
@@ -0,0 +1,36 @@
+import threading
+from collections import defaultdict
+
+# Process-local counters and gauges, exposed as JSON on /api/metrics.
+# Labels are folded into the key, e.g. inc("retries", route="chat") -> "retries{route=chat}".
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def get(name, **labels):
+    with _lock:
+        key = _key(name, labels)
+        return _counters.get(key, _gauges.get(key, 0))
+
+
+def snapshot():
+    with _lock:
+        return {'counters': dict(_counters), 'gauges': dict(_gauges)}
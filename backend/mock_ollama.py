@@ -0,0 +1,239 @@
+import json
+import random
+import re
+import threading
+import time
+import argparse
+import contextlib
+import os
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Simulated cost model (milliseconds per token). Ollama re-evaluates every
+# prompt token it has not seen before, so prompt size drives latency.
+PROMPT_EVAL_MS_PER_TOKEN = 0.5
+EVAL_MS_PER_TOKEN = 2.0
+EMBED_MS = 5.0
+EMBED_DIM = 256
+# Token sequences (conversations, recent prompts) whose KV state a server keeps
+KV_CACHE_ENTRIES = 32
+
+
+def _tokens(text: str):
+    return re.findall(r"\w+|[^\w\s]", text or "")
+
+
+def _token_ids(tokens):
+    return [hash(t) % 32000 for t in tokens]
+
+
+def _answer_for(prompt: str) -> str:
+    """
+    Deterministic canned output shaped like what phi3:mini returns for our prompts.
+    """
+    low = prompt.lower()
+    if "flashcard" in low:
+        return "\n".join(
+            f"Q: What is key idea {i} of this topic?\nA: Key idea {i} explained in one short line."
+            for i in range(1, 6)
+        )
+    if "mcq" in low:
+        return "\n".join(
+            f"Q: Which statement about point {i} is correct?\nA) First\nB) Second\nC) Third\nD) Fourth\nANSWER: B"
+            for i in range(1, 4)
+        )
+    return "Here is a clear answer in under one hundred words. " * 3
+
+
+def _mock_vector(text: str):
+    vec = [0.0] * EMBED_DIM
+    for tok in _tokens(text.lower()):
+        vec[hash(tok) % EMBED_DIM] += 1.0
+    return vec
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        # Clients drop keep-alive connections after errors and cancellations; that's not news
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            return self._send_json(200, {"models": [{"name": "phi3:mini"}]})
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/api/generate":
+            return self._generate(self._read_json())
+        if self.path == "/api/embeddings":
+            return self._embeddings(self._read_json())
+        if self.path == "/api/embed":
+            return self._embed_batch(self._read_json())
+        self._send_json(404, {"error": "not found"})
+
+    def _generate(self, payload):
+        server = self.server
+        # Simulated outages: "error" answers 503, "hang" accepts and never answers;
+        # error_rate answers 503 to that share of requests (busy, model loading)
+        if server.fault == "error" or (server.error_rate and random.random() < server.error_rate):
+            with server.lock:
+                server.stats["errors"] += 1
+            return self._send_json(503, {"error": "server busy"})
+        if server.fault == "hang":
+            while server.fault == "hang":
+                time.sleep(0.05)
+        # Like one loaded model (OLLAMA_NUM_PARALLEL): generations beyond `parallel` wait their turn
+        with server.slots:
+            self._generate_locked(payload)
+
+    def _generate_locked(self, payload):
+        server = self.server
+        prompt = payload.get("prompt", "")
+        system = payload.get("system", "")
+        context = payload.get("context") or []
+
+        # Like Ollama's prompt cache: the input is `context` followed by system and
+        # prompt, and only what follows the longest prefix of a recent sequence
+        # costs anything. The cache is per server: a context produced elsewhere is
+        # evaluated again, and so is a prompt whose variable part comes first.
+        new_tokens = _tokens(system) + _tokens(prompt)
+        sequence = list(context) + _token_ids(new_tokens)
+        with server.lock:
+            reused = max((len(os.path.commonprefix([sequence, seen])) for seen in server.kv), default=0)
+        evaluated = len(sequence) - reused
+        cached = reused >= len(context)
+        prompt_eval_s = evaluated * server.prompt_eval_ms / 1000.0
+        out_text = _answer_for(system + "\n" + prompt)
+        out_tokens = re.findall(r"\S+\s*", out_text)
+        eval_s = len(out_tokens) * server.eval_ms / 1000.0
+
+        with server.lock:
+            server.stats["generate"] += 1
+            server.stats["prompt_tokens"] += evaluated
+            server.stats["context_misses"] += 0 if cached else 1
+
+        time.sleep(prompt_eval_s)
+        # An occasional slow start (another tenant, a GC pause, swapping)
+        if server.stall_rate and random.random() < server.stall_rate:
+            time.sleep(server.stall_ms / 1000.0)
+        new_context = sequence + _token_ids(out_tokens)
+        with server.lock:
+            server.kv.append(new_context)
+        final = {
+            "model": payload.get("model", "phi3:mini"),
+            "done": True,
+            "context": new_context,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(prompt_eval_s * 1e9),
+            "eval_count": len(out_tokens),
+            "eval_duration": int(eval_s * 1e9),
+            "total_duration": int((prompt_eval_s + eval_s) * 1e9),
+        }
+
+        if not payload.get("stream", True):
+            time.sleep(eval_s)
+            with server.lock:
+                server.stats["eval_tokens"] += len(out_tokens)
+            final["response"] = out_text
+            return self._send_json(200, final)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        per_token = server.eval_ms / 1000.0
+        try:
+            for tok in out_tokens:
+                time.sleep(per_token)
+                with server.lock:
+                    server.stats["eval_tokens"] += 1
+                self._write_chunk({"model": final["model"], "response": tok, "done": False})
+            final["response"] = ""
+            self._write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Like Ollama: the client hung up, so generation stops here
+            with server.lock:
+                server.stats["aborted"] += 1
+
+    def _embeddings(self, payload):
+        server = self.server
+        with server.lock:
+            server.stats["embeddings"] += 1
+        time.sleep(server.embed_ms / 1000.0)
+        self._send_json(200, {"embedding": _mock_vector(payload.get("prompt", ""))})
+
+    def _embed_batch(self, payload):
+        # One forward pass per request plus a small per-input cost
+        server = self.server
+        inputs = payload.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        with server.lock:
+            server.stats["embeddings"] += 1
+        time.sleep(server.embed_ms / 1000.0 + len(inputs) * 0.0005)
+        self._send_json(200, {"embeddings": [_mock_vector(t) for t in inputs]})
+
+    def _write_chunk(self, data):
+        line = json.dumps(data).encode() + b"\n"
+        self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+def start_mock_server(port: int = 0, prompt_eval_ms: float = PROMPT_EVAL_MS_PER_TOKEN,
+                      eval_ms: float = EVAL_MS_PER_TOKEN, embed_ms: float = EMBED_MS, parallel: int = None):
+    """
+    Start the mock in a daemon thread. Returns (server, base_url).
+    `parallel` caps concurrent generations (default: unlimited).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOllamaHandler)
+    server.daemon_threads = True
+    server.prompt_eval_ms = prompt_eval_ms
+    server.eval_ms = eval_ms
+    server.embed_ms = embed_ms
+    server.fault = None
+    server.stall_rate, server.stall_ms = 0.0, 0.0
+    server.error_rate = 0.0
+    server.kv = deque(maxlen=KV_CACHE_ENTRIES)
+    server.slots = threading.BoundedSemaphore(parallel) if parallel else contextlib.nullcontext()
+    server.lock = threading.Lock()
+    server.stats = {"generate": 0, "prompt_tokens": 0, "eval_tokens": 0, "aborted": 0, "embeddings": 0,
+                    "context_misses": 0, "errors": 0}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Ollama server for local benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--prompt-eval-ms", type=float, default=PROMPT_EVAL_MS_PER_TOKEN)
+    parser.add_argument("--eval-ms", type=float, default=EVAL_MS_PER_TOKEN)
+    parser.add_argument("--parallel", type=int, default=None)
+    args = parser.parse_args()
+    srv, url = start_mock_server(args.port, args.prompt_eval_ms, args.eval_ms, parallel=args.parallel)
+    print(f"🧪 Mock Ollama running at {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        srv.shutdown()
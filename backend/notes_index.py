@@ -0,0 +1,264 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from heapq import nlargest
+
+# Words per chunk and how many words consecutive chunks share
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+ALLOWED_EXTENSIONS = {".txt", ".md", ".markdown", ".pdf"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were
+will with what which who how why when where do does did can not no but if then than so such
+""".split())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    sha256 TEXT NOT NULL UNIQUE,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    doc_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_doc ON chunks(doc_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, chunk_id)
+) WITHOUT ROWID;
+"""
+
+
+def tokenize(text: str):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _iter_lines(stream, filename: str):
+    """
+    Yield text lines from an uploaded file without reading it all into memory.
+    PDFs are read page by page (needs the optional `pypdf` package).
+    """
+    if filename.lower().endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ValueError("PDF upload needs the 'pypdf' package installed")
+        for page in PdfReader(stream).pages:
+            yield from (page.extract_text() or "").splitlines()
+        return
+    for line in stream:
+        yield line.decode("utf-8", errors="replace")
+
+
+def iter_chunks(lines, size: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP):
+    """
+    Group a stream of lines into overlapping windows of `size` words.
+    """
+    window = []
+    emitted = False
+    for line in lines:
+        window.extend(line.split())
+        while len(window) >= size:
+            yield " ".join(window[:size])
+            emitted = True
+            window = window[size - overlap:]
+    # The first `overlap` words of the tail were already part of the last chunk
+    if len(window) > (overlap if emitted else 0):
+        yield " ".join(window)
+
+
+class NotesIndex:
+    """
+    On-disk inverted index (SQLite) over chunks of uploaded study notes, scored with BM25.
+
+    Postings for a term are loaded once and kept in memory, together with every
+    chunk's length, so a warm query is a handful of dict lookups. Adding a
+    document only touches the terms it contains. Changes committed by another
+    process (another worker) are noticed through PRAGMA data_version, which
+    drops the cached stats before the next query.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._postings = {}
+        # term -> [(chunk_id, bm25 weight)]; depends on corpus stats, so reset on every change
+        self._weights = {}
+        self._data_version = None
+        self._sync()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def reopen(self):
+        """
+        Open a fresh connection after fork(); see Store.reopen.
+        """
+        with self._lock:
+            self._db = self._connect()
+            self._data_version = None
+
+    def __len__(self):
+        self._sync()
+        return len(self._lengths)
+
+    def _sync(self):
+        # data_version changes whenever a commit is made through another connection
+        with self._lock:
+            version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            self._lengths = dict(self._db.execute("SELECT id, length FROM chunks"))
+            self._total_length = sum(self._lengths.values())
+            self._postings.clear()
+            self._weights.clear()
+
+    def add_document(self, name: str, stream) -> dict:
+        """
+        Chunk and index a seekable file-like object (e.g. a Flask upload) as it is read.
+        Re-uploading identical content is a no-op.
+        """
+        digest = hashlib.sha256()
+        for block in iter(lambda: stream.read(1 << 16), b""):
+            digest.update(block)
+        sha = digest.hexdigest()
+        stream.seek(0)
+
+        with self._lock:
+            # In-memory stats change only once the transaction has committed, so a
+            # chunk that fails to parse (rolling the whole upload back) leaves them alone
+            lengths = {}
+            touched = set()
+            with self._db:
+                existing = self._db.execute("SELECT id FROM documents WHERE sha256 = ?", (sha,)).fetchone()
+                if existing:
+                    return {'id': existing[0], 'name': name, 'chunks': 0, 'duplicate': True}
+
+                doc_id = self._db.execute(
+                    "INSERT INTO documents (name, sha256, added) VALUES (?, ?, ?)", (name, sha, time.time())
+                ).lastrowid
+                for text in iter_chunks(_iter_lines(stream, name)):
+                    terms = Counter(tokenize(text))
+                    length = sum(terms.values())
+                    chunk_id = self._db.execute(
+                        "INSERT INTO chunks (doc_id, text, length) VALUES (?, ?, ?)", (doc_id, text, length)
+                    ).lastrowid
+                    self._db.executemany(
+                        "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                        [(term, chunk_id, tf) for term, tf in terms.items()],
+                    )
+                    lengths[chunk_id] = length
+                    touched.update(terms)
+            self._lengths.update(lengths)
+            self._total_length += sum(lengths.values())
+            self._forget(touched)
+        return {'id': doc_id, 'name': name, 'chunks': len(lengths), 'duplicate': False}
+
+    def remove_document(self, doc_id: int) -> bool:
+        with self._lock:
+            touched = set()
+            with self._db:
+                chunk_ids = [r[0] for r in self._db.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,))]
+                if not chunk_ids and not self._db.execute(
+                        "SELECT 1 FROM documents WHERE id = ?", (doc_id,)).fetchone():
+                    return False
+                for chunk_id in chunk_ids:
+                    touched.update(r[0] for r in self._db.execute(
+                        "SELECT term FROM postings WHERE chunk_id = ?", (chunk_id,)))
+                    self._db.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+                self._db.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+                self._db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+            for chunk_id in chunk_ids:
+                self._total_length -= self._lengths.pop(chunk_id, 0)
+            self._forget(touched)
+        return True
+
+    def documents(self):
+        with self._lock:
+            rows = self._db.execute("""
+                SELECT d.id, d.name, d.added, COUNT(c.id) FROM documents d
+                LEFT JOIN chunks c ON c.doc_id = d.id GROUP BY d.id ORDER BY d.id
+            """).fetchall()
+        return [{'id': r[0], 'name': r[1], 'added': r[2], 'chunks': r[3]} for r in rows]
+
+    def search(self, query: str, k: int = 4):
+        """
+        Return the top-k (chunk_id, score) pairs for `query` by BM25.
+        """
+        self._sync()
+        if not self._lengths:
+            return []
+        scores = {}
+        for term in set(tokenize(query)):
+            for chunk_id, weight in self._term_weights(term):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight
+        return nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def chunk_texts(self, chunk_ids):
+        if not chunk_ids:
+            return []
+        marks = ",".join("?" * len(chunk_ids))
+        with self._lock:
+            found = dict(self._db.execute(f"SELECT id, text FROM chunks WHERE id IN ({marks})", list(chunk_ids)))
+        return [found[c] for c in chunk_ids if c in found]
+
+    def document_chunks(self, doc_id: int):
+        """
+        (chunk_id, text) pairs of one document, e.g. to embed it after indexing.
+        """
+        with self._lock:
+            return self._db.execute("SELECT id, text FROM chunks WHERE doc_id = ? ORDER BY id", (doc_id,)).fetchall()
+
+    def _term_weights(self, term: str):
+        weights = self._weights.get(term)
+        if weights is None:
+            postings = self._load(term)
+            n = len(self._lengths)
+            avg_len = self._total_length / n if n else 1.0
+            lengths = self._lengths
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            weights = []
+            for chunk_id, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths.get(chunk_id, 0) / (avg_len or 1.0))
+                weights.append((chunk_id, idf * tf * (BM25_K1 + 1) / (tf + norm)))
+            self._weights[term] = weights
+        return weights
+
+    def _load(self, term: str):
+        postings = self._postings.get(term)
+        if postings is None:
+            with self._lock:
+                postings = self._db.execute(
+                    "SELECT chunk_id, tf FROM postings WHERE term = ?", (term,)).fetchall()
+                self._postings[term] = postings
+        return postings
+
+    def _forget(self, terms):
+        for term in terms:
+            self._postings.pop(term, None)
+        self._weights.clear()
+
@@ -0,0 +1,243 @@
+"""
+A pool of Ollama servers. Each generation goes to the healthy host with the
+least outstanding work, measured in estimated tokens (prompt plus expected
+completion) and then in requests.
+
+Requests with an affinity key (a chat session, a topic) are instead placed by
+consistent hashing, so follow-ups reach the host that already holds their KV
+context and warm prompt prefix. Load is bounded: a host already running more
+than AFFINITY_LOAD_FACTOR times the mean number of requests is passed over
+for the next one on the ring.
+
+Health is each host's circuit breaker: a host whose circuit opens is ejected,
+and comes back through half-open probing once its cool-down has passed.
+Calls that fail before producing anything for a transient reason are retried
+(see retry_budget), on another host if there is one. Embeddings go through
+the same hosts, breakers and retry budget.
+"""
+import bisect
+import hashlib
+import math
+import os
+import threading
+import time
+
+import requests
+
+from circuit_breaker import CircuitOpenError, breaker_for
+from hedging import hedged
+from llm_client import EMBED_MODEL, embed_batch_from_ollama, stream_generate
+import metrics
+from retry_budget import RETRY_MAX_ATTEMPTS, RetryBudget, backoff, transient_reason
+
+# Comma-separated base URLs; a single OLLAMA_HOST still works
+OLLAMA_HOSTS = [h.strip().rstrip("/") for h in
+                os.getenv("OLLAMA_HOSTS", os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")).split(",")
+                if h.strip()]
+# "off" routes everything by load alone
+AFFINITY_ROUTING = os.getenv("AFFINITY_ROUTING", "on") != "off"
+AFFINITY_LOAD_FACTOR = float(os.getenv("AFFINITY_LOAD_FACTOR", "1.25"))
+# Points per host on the hash ring; more points, more even shares
+RING_REPLICAS = 64
+
+
+def _ring_hash(key) -> int:
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class Host:
+    def __init__(self, url: str):
+        self.url = url
+        self.breaker = breaker_for(url)
+        self.outstanding = 0
+        self.outstanding_tokens = 0
+
+    def load(self):
+        return self.outstanding_tokens, self.outstanding
+
+
+class OllamaPool:
+    def __init__(self, urls=None, affinity: bool = AFFINITY_ROUTING, load_factor: float = AFFINITY_LOAD_FACTOR):
+        self.affinity = affinity
+        self.load_factor = load_factor
+        self.retry_budget = RetryBudget()
+        self._lock = threading.Lock()
+        self.set_hosts(urls or OLLAMA_HOSTS)
+
+    def set_hosts(self, urls):
+        with self._lock:
+            self.hosts = [Host(url.rstrip("/")) for url in urls]
+            # Points are hashed from the URL, so a host keeps its keys when others come and go
+            ring = sorted((_ring_hash(f"{host.url}#{i}"), n) for n, host in enumerate(self.hosts)
+                          for i in range(RING_REPLICAS))
+            self._ring_points = [point for point, _ in ring]
+            self._ring_hosts = [self.hosts[n] for _, n in ring]
+        self._publish()
+
+    def available(self) -> bool:
+        # False when every host's circuit is open
+        return any(not host.breaker.is_open() for host in self.hosts)
+
+    def retry_after(self) -> float:
+        # Until the first ejected host may be probed again (0 if any host is usable)
+        return min(host.breaker.retry_after() if host.breaker.is_open() else 0.0 for host in self.hosts)
+
+    def check(self, timeout: float = 3) -> bool:
+        """
+        True if some host whose circuit isn't open answers /api/tags.
+        """
+        for host in self.hosts:
+            if host.breaker.is_open():
+                continue
+            try:
+                if requests.get(f"{host.url}/api/tags", timeout=timeout).status_code == 200:
+                    return True
+            except requests.exceptions.RequestException:
+                pass
+        return False
+
+    def stream_generate(self, payload: dict, estimated_tokens: int = 0, affinity=None, hedge=None,
+                        route: str = "other", timeout: float = 120, should_stop=None):
+        """
+        llm_client.stream_generate on the healthy host that owns `affinity`
+        (if given and that host isn't overloaded) or else the least-loaded one.
+        A host that refuses the call at its breaker (e.g. half-open with its
+        probes in use) is skipped for the next; CircuitOpenError only if none is left.
+        Transient failures are retried within `timeout`; `route` labels the retry metrics.
+
+        With a hedging.HedgePolicy as `hedge` (and more than one host), a slow
+        first token gets the request duplicated to a second host.
+        """
+        self.retry_budget.earn()
+        if hedge is None or len(self.hosts) < 2:
+            return self._stream_generate(payload, estimated_tokens, affinity, route, timeout, should_stop)
+
+        def launch(exclude, on_host, stop):
+            return self._stream_generate(payload, estimated_tokens, affinity, route, timeout, stop, exclude, on_host)
+
+        return hedged(launch, hedge, should_stop)
+
+    def _stream_generate(self, payload, estimated_tokens, affinity, route, timeout, should_stop,
+                         exclude=(), on_host=None):
+        tried = set(exclude)
+        failed = set()
+        started = time.monotonic()
+        retries = 0
+        while True:
+            host = self._acquire(estimated_tokens, tried, affinity, failed)
+            if on_host is not None:
+                on_host(host)
+            produced = False
+            try:
+                remaining = max(0.001, timeout - (time.monotonic() - started))
+                for chunk in stream_generate(payload, f"{host.url}/api/generate", timeout=remaining,
+                                             should_stop=should_stop):
+                    produced = True
+                    yield chunk
+                return
+            except CircuitOpenError:
+                tried.add(host)
+            except requests.exceptions.RequestException as e:
+                delay = None if produced else self._retry_delay(e, retries, started, timeout, route, should_stop)
+                if delay is None:
+                    raise
+                retries += 1
+                failed.add(host)
+                time.sleep(delay)
+            finally:
+                self._release(host, estimated_tokens)
+
+    def embed(self, texts, model: str = EMBED_MODEL, timeout: float = 60):
+        """
+        llm_client.embed_batch_from_ollama on the least-loaded healthy host,
+        retried like generations. The signature EmbeddingService expects.
+        """
+        self.retry_budget.earn()
+        estimated_tokens = sum(len(text) for text in texts) // 4
+        tried = set()
+        failed = set()
+        started = time.monotonic()
+        retries = 0
+        while True:
+            host = self._acquire(estimated_tokens, tried, avoid=failed)
+            try:
+                remaining = max(0.001, timeout - (time.monotonic() - started))
+                return embed_batch_from_ollama(texts, model, timeout=remaining, host=host.url)
+            except CircuitOpenError:
+                tried.add(host)
+            except requests.exceptions.RequestException as e:
+                delay = self._retry_delay(e, retries, started, timeout, "embed")
+                if delay is None:
+                    raise
+                retries += 1
+                failed.add(host)
+                time.sleep(delay)
+            finally:
+                self._release(host, estimated_tokens)
+
+    def _retry_delay(self, error, retries, started, timeout, route, should_stop=None):
+        # Backoff before another attempt after `error`, or None if it should be raised
+        elapsed = time.monotonic() - started
+        reason = transient_reason(error, elapsed, timeout)
+        delay = backoff(retries)
+        if (reason is None or retries + 1 >= RETRY_MAX_ATTEMPTS or elapsed + delay >= timeout
+                or (should_stop is not None and should_stop())):
+            return None
+        if not self.retry_budget.spend():
+            metrics.inc("upstream_retry_budget_exhausted", route=route)
+            return None
+        metrics.inc("upstream_retries", route=route, reason=reason)
+        return delay
+
+    def _acquire(self, estimated_tokens, exclude, affinity=None, avoid=()):
+        with self._lock:
+            candidates = [h for h in self.hosts if h not in exclude and not h.breaker.is_open()]
+            if not candidates:
+                raise CircuitOpenError("pool", self.retry_after())
+            # Retries go elsewhere if they can
+            candidates = [h for h in candidates if h not in avoid] or candidates
+            if affinity is None or not self.affinity:
+                host = min(candidates, key=Host.load)
+            else:
+                host = self._by_affinity(affinity, candidates)
+            host.outstanding += 1
+            host.outstanding_tokens += estimated_tokens
+        metrics.inc("pool_requests", host=host.url)
+        self._publish()
+        return host
+
+    def _by_affinity(self, key, candidates):
+        # Consistent hashing with bounded loads: the first host clockwise from the
+        # key's point that is healthy and below ceil(load_factor × mean requests)
+        limit = math.ceil(self.load_factor * (sum(h.outstanding for h in candidates) + 1) / len(candidates))
+        start = bisect.bisect(self._ring_points, _ring_hash(key))
+        owner = self._ring_hosts[start % len(self._ring_hosts)]
+        for i in range(len(self._ring_hosts)):
+            host = self._ring_hosts[(start + i) % len(self._ring_hosts)]
+            if host in candidates and host.outstanding < limit:
+                break
+        else:
+            host = min(candidates, key=Host.load)
+        if host is owner:
+            metrics.inc("pool_affinity", result="hit")
+        else:
+            metrics.inc("pool_affinity", result="overloaded" if owner in candidates else "unavailable")
+        return host
+
+    def affinity_hit_rate(self) -> float:
+        hits = metrics.get("pool_affinity", result="hit")
+        total = hits + metrics.get("pool_affinity", result="overloaded") + metrics.get(
+            "pool_affinity", result="unavailable")
+        return hits / max(1, total)
+
+    def _release(self, host, estimated_tokens):
+        with self._lock:
+            host.outstanding -= 1
+            host.outstanding_tokens -= estimated_tokens
+        self._publish()
+
+    def _publish(self):
+        for host in self.hosts:
+            metrics.set_gauge("pool_outstanding", host.outstanding, host=host.url)
+            metrics.set_gauge("pool_outstanding_tokens", host.outstanding_tokens, host=host.url)
+        metrics.set_gauge("pool_healthy_hosts", sum(1 for h in self.hosts if not h.breaker.is_open()))
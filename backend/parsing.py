@@ -0,0 +1,96 @@
+import re
+
+# Server-side counterparts of parseFlashcards / parseQuiz in static/parser.js,
+# used wherever the backend needs structured cards (exports, partial results).
+
+_QUESTION_WORDS = re.compile(r"what|how|why|when|where|who|explain|define", re.I)
+
+
+def clean_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").replace("**", "").strip()
+
+
+def complete_lines(text: str) -> str:
+    """
+    `text` up to its last newline: drops the line a cut-off generation was still writing.
+    """
+    end = (text or "").rfind("\n")
+    return text[:end + 1] if end >= 0 else ""
+
+
+def parse_flashcards(text: str, limit: int = 5):
+    """
+    List of (question, answer) pairs from the model's "Q: ... / A: ..." output.
+    """
+    if not text:
+        return []
+    lines = [l.strip() for l in text.split("\n") if len(l.strip()) > 3]
+    cards = []
+    i = 0
+    while i < len(lines) and len(cards) < limit:
+        line = lines[i]
+        if (line.endswith("?") or re.match(r"^Q[:.\-\s]|^Question|^\d+[:.]", line, re.I)
+                or (len(line) > 15 and _QUESTION_WORDS.search(line))):
+            question = re.sub(r"^Q[:.\-\s]\s*|^Question\s*\d*[:.\-\s]*", "", line, flags=re.I).strip()
+            question = re.sub(r"^\d+[:.]\s*", "", question).strip()
+            for j in range(i + 1, min(i + 4, len(lines))):
+                nxt = lines[j]
+                if re.match(r"^A[:.\-\s]|^Answer", nxt, re.I) or (
+                        len(nxt) > 8 and not nxt.endswith("?") and not re.match(r"^Q|^Question", nxt, re.I)):
+                    answer = re.sub(r"^A[:.\-\s]\s*|^Answer\s*[:.\-\s]*", "", nxt, flags=re.I).strip()
+                    answer = re.sub(r"^\d+[:.]\s*", "", answer).strip()
+                    if question and answer:
+                        cards.append((clean_text(question), clean_text(answer)))
+                    i = j
+                    break
+        i += 1
+    return cards
+
+
+def parse_quiz(text: str, require_answer: bool = False):
+    """
+    List of {'question', 'options', 'answer'} dicts from "Q: / A) .. D) / ANSWER: x" output.
+    Questions with fewer than two options are dropped, like the frontend does;
+    with `require_answer`, so are questions without an ANSWER line (e.g. cut off).
+    """
+    if not text:
+        return []
+    questions = []
+    current = None
+    for line in (l.strip() for l in text.split("\n")):
+        if len(line) <= 2:
+            continue
+        if re.match(r"^Q[:.]|^\d+\.|^Question", line, re.I) and len(line) > 10:
+            if current and len(current['options']) >= 2:
+                questions.append(current)
+            current = {
+                'question': re.sub(r"^Q[:.]\s*|^\d+\.\s*|^Question\s*\d*[:.\s]*", "", line, flags=re.I).strip(),
+                'options': [],
+                'answer': '',
+            }
+        elif current and re.match(r"^[A-D][).\-\s]|^Option\s*[A-D]", line, re.I):
+            option = re.sub(r"^[A-D][).\-\s]\s*|^Option\s*[A-D][\-\s]*", "", line, flags=re.I).strip()
+            if len(option) > 1:
+                current['options'].append(clean_text(option))
+        elif current and re.match(r"^ANSWER:\s*[A-D]|^Correct:\s*[A-D]", line, re.I):
+            current['answer'] = re.search(r"[A-D]", line.split(":", 1)[1], re.I).group(0).upper()
+    if current and len(current['options']) >= 2:
+        questions.append(current)
+    if require_answer:
+        questions = [q for q in questions if q['answer']]
+    for q in questions:
+        q['answer'] = q['answer'] or 'A'
+    return questions
+
+
+def format_flashcards(cards) -> str:
+    # Canonical "Q: / A:" text, as parseFlashcards in static/parser.js expects it
+    return "\n".join(f"Q: {question}\nA: {answer}" for question, answer in cards)
+
+
+def format_quiz(questions) -> str:
+    return "\n\n".join(
+        "\n".join([f"Q: {q['question']}"]
+                  + [f"{chr(65 + i)}) {option}" for i, option in enumerate(q['options'])]
+                  + [f"ANSWER: {q['answer']}"])
+        for q in questions)
@@ -0,0 +1,152 @@
+"""
+Versioned prompt templates.
+
+Ollama keeps the evaluated tokens of recent prompts and only evaluates what
+follows the longest prefix it has seen. Templates therefore put a long static
+instruction first, in the `system` field, and everything that varies per
+request (notes, topic, question) at the very end of `prompt`. Two requests
+for different topics then share every token up to the topic.
+
+Templates are parsed once when registered. The newest version of each is used
+unless PROMPT_VERSIONS pins another, e.g. PROMPT_VERSIONS="quiz=1,chat=1".
+"""
+import os
+from string import Formatter
+
+_registry = {}
+
+PINNED_VERSIONS = dict(
+    pair.strip().split("=", 1) for pair in os.getenv("PROMPT_VERSIONS", "").split(",") if "=" in pair)
+
+
+class PromptTemplate:
+    def __init__(self, name: str, version: int, prompt: str, system: str = ""):
+        self.name = name
+        self.version = version
+        self.system = system
+        # (literal, field) pairs: rendering is a join, no format-string parsing per request
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(prompt)]
+        self.fields = {field for _, field in self._parts if field}
+
+    def render(self, **values) -> dict:
+        """
+        The `prompt` (and `system`, if any) fields of an /api/generate payload.
+        """
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"prompt '{self.name}' v{self.version} needs {', '.join(sorted(missing))}")
+        rendered = {"prompt": "".join(literal + (str(values[field]) if field else "")
+                                      for literal, field in self._parts)}
+        if self.system:
+            rendered["system"] = self.system
+        return rendered
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    _registry.setdefault(template.name, {})[template.version] = template
+    return template
+
+
+def get_template(name: str, version: int = None) -> PromptTemplate:
+    versions = _registry[name]
+    if version is None:
+        version = int(PINNED_VERSIONS.get(name, max(versions)))
+    return versions[version]
+
+
+def render(name: str, **values) -> dict:
+    return get_template(name).render(**values)
+
+
+def notes_section(material: str) -> str:
+    return f"Notes:\n{material}\n\n" if material else ""
+
+
+def context_section(material: str) -> str:
+    return f"Context: {material}" if material else ""
+
+
+# --- Version 1: the original inline prompts' layout, variables first (kept for pinning and benchmarks) ---
+
+register(PromptTemplate("flashcards", 1, """
+Generate exactly 5 flashcards about {topic}.
+Format strictly:
+Q: question
+A: answer (1–2 lines)
+{notes}
+"""))
+
+register(PromptTemplate("quiz", 1, """
+Make 3 MCQ questions on {topic}.
+Format:
+Q:
+A)
+B)
+C)
+D)
+ANSWER: letter
+{notes}
+"""))
+
+register(PromptTemplate("summary", 1, """
+Summarize this tutoring conversation in ≤120 words.
+Keep the topics and facts the student asked about.
+Previous summary: {summary}
+{turns}
+"""))
+
+register(PromptTemplate("chat", 1, "Answer clearly in ≤100 words.\n{conversation}"))
+
+# A turn appended to the session's Ollama context, which already holds the chat
+# system prompt and every earlier turn: that context is the reused prefix
+register(PromptTemplate("chat_followup", 1, """
+Question: {question}
+{context}
+"""))
+
+register(PromptTemplate("bullets", 1, (
+    "You are a helpful assistant. Answer the user's query as a clear bullet-point list.\n"
+    "For each bullet: start with the key point in bold (use ** **), then give 1-2 short lines of explanation.\n"
+    "Keep bullets concise and use at most 3-5 main bullet points.\n\n"
+    "{query}")))
+
+
+# --- Version 2: static system prefix, variables last ---
+
+register(PromptTemplate("flashcards", 2, "{notes}Topic: {topic}\n", system="""\
+You are SmartPrep, a study assistant that writes flashcards for students revising for exams.
+Write exactly 5 flashcards about the topic the student gives.
+Format every flashcard strictly as two lines, with nothing before, between or after them:
+Q: question
+A: answer (1–2 lines)
+Each question tests one idea and each answer is short, accurate and self-contained.
+When study notes are given, base the flashcards on those notes."""))
+
+register(PromptTemplate("quiz", 2, "{notes}Topic: {topic}\n", system="""\
+You are SmartPrep, a study assistant that writes multiple-choice (MCQ) quizzes for students revising for exams.
+Make 3 MCQ questions about the topic the student gives.
+Format every question strictly as follows, with nothing before, between or after the questions:
+Q: question
+A) option
+B) option
+C) option
+D) option
+ANSWER: letter
+Exactly one option is correct and the wrong options are plausible.
+When study notes are given, base the questions on those notes."""))
+
+register(PromptTemplate("summary", 2, "Previous summary: {summary}\n{turns}\n", system="""\
+You summarize tutoring conversations between a student and SmartPrep, an AI tutor.
+Write at most 120 words. Keep the topics and facts the student asked about and drop small talk.
+The summary replaces the older part of the conversation, so it must stand on its own."""))
+
+# `conversation` is chat_history.build_prompt output (summary, recent turns, context, question)
+register(PromptTemplate("chat", 2, "{conversation}", system="""\
+You are SmartPrep, a friendly tutor helping a student revise.
+Answer the student's question clearly in at most 100 words.
+Use the conversation so far and any context or notes provided when they are relevant."""))
+
+register(PromptTemplate("bullets", 2, "{query}", system="""\
+You are a helpful assistant. Answer the user's query as a clear bullet-point list.
+For each bullet: start with the key point in bold (use ** **), then give 1-2 short lines of explanation.
+Keep bullets concise and use at most 3-5 main bullet points."""))
@@ -0,0 +1,62 @@
+"""
+Retries for upstream generations that failed before producing anything:
+connection refused or reset, and 503 (Ollama busy or still loading the
+model). Delays use full-jitter exponential backoff. A process-wide budget
+keeps retries to RETRY_BUDGET of requests, so an outage doesn't turn into a
+retry storm.
+"""
+import os
+import random
+import threading
+
+import requests
+
+# Retries per request, on average (credit earned per request; a retry costs 1)
+RETRY_BUDGET = float(os.getenv("RETRY_BUDGET", "0.1"))
+# Credit saved up in quiet times, i.e. the burst of retries allowed beyond the ratio
+RETRY_MAX_CREDIT = 3.0
+# Attempts per request, the first one included
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 2.0
+
+
+class RetryBudget:
+    def __init__(self, ratio: float = RETRY_BUDGET, max_credit: float = RETRY_MAX_CREDIT):
+        self.ratio = ratio
+        self.max_credit = max_credit
+        # Start empty: retries are earned by requests, so a storm right after start-up stays within the ratio
+        self._credit = 0.0
+        self._lock = threading.Lock()
+
+    def earn(self):
+        with self._lock:
+            self._credit = min(self.max_credit, self._credit + self.ratio)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                return False
+            self._credit -= 1.0
+            return True
+
+
+def backoff(retry: int) -> float:
+    # Full jitter: anywhere up to the exponential delay, so retries don't arrive in lockstep
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retry))
+
+
+def transient_reason(error, elapsed: float, timeout: float):
+    """
+    Metric label for a failure worth retrying, or None. The caller must only
+    ask about calls that produced no output, which makes them safe to repeat.
+    """
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return "busy" if response is not None and response.status_code == 503 else None
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return "connect"
+    # requests reports a read timeout mid-stream as a ConnectionError too; that's not transient
+    if isinstance(error, requests.exceptions.ConnectionError) and elapsed < timeout:
+        return "connection"
+    return None
@@ -0,0 +1,247 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from deadline import DeadlineExceeded
+import metrics
+
+# Job priorities (lower runs first). Interactive requests run on their own
+# request thread and are only *tracked* here; the rest are queued.
+INTERACTIVE = 0
+BATCH = 5
+SPECULATIVE = 10
+
+# Background jobs that may talk to Ollama at once
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "1"))
+# Speculative results nobody asked for within this time count as wasted
+SPECULATIVE_TTL = float(os.getenv("SPECULATIVE_TTL_SECONDS", "600"))
+SPECULATIVE_MAX_ENTRIES = 200
+# Don't pile up speculation behind a busy model
+SPECULATIVE_MAX_QUEUED = 4
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join((topic or "").lower().split())
+
+
+class Job:
+    def __init__(self, fn, priority, key=None, deadline=None):
+        self.fn = fn
+        self.priority = priority
+        self.key = key
+        # Optional deadline.Deadline: the job is dropped if it expires while queued,
+        # and fn should bound its own upstream calls by it (see timeout())
+        self.deadline = deadline
+        # Nobody waits on a speculative job until it is promoted; from then on its
+        # deadline is its waiters' (the latest of them, None meaning unbounded)
+        self.awaited = priority != SPECULATIVE
+        self.future = Future()
+        # Set when an interactive request needs the model; long jobs should poll it
+        self.cancel_event = threading.Event()
+
+    def timeout(self, cap: float) -> float:
+        # For fn's upstream calls: `cap`, or less if the deadline comes first
+        return self.deadline.timeout(cap) if self.deadline is not None else cap
+
+
+class GenerationScheduler:
+    """
+    Priority queue in front of Ollama for work that no user is waiting on.
+
+    Speculative jobs only start when no interactive request is in flight, and
+    a running speculative job is asked to stop (via its cancel_event) as soon
+    as an interactive request for a different key starts.
+    """
+
+    def __init__(self, workers: int = GENERATION_WORKERS):
+        self.workers = workers
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._interactive = 0
+        self._running = set()
+        self._by_key = {}
+        self._threads = []
+        self._pid = None
+        self._draining = False
+
+    @contextmanager
+    def interactive(self, key=None):
+        with self._cond:
+            self._interactive += 1
+            for job in self._running:
+                if job.priority == SPECULATIVE and job.key != key:
+                    job.cancel_event.set()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._interactive -= 1
+                self._cond.notify_all()
+
+    def submit(self, fn, priority: int = BATCH, key=None, deadline=None) -> Future:
+        """
+        Queue `fn(job)`; returns a Future with its result. Jobs with a key that is
+        already queued or running are not duplicated.
+        """
+        self._ensure_workers()
+        with self._cond:
+            if key is not None and key in self._by_key:
+                return self._by_key[key].future
+            if priority == SPECULATIVE and self.queued(SPECULATIVE) >= SPECULATIVE_MAX_QUEUED:
+                future = Future()
+                future.cancel()
+                return future
+            job = Job(fn, priority, key, deadline)
+            if key is not None:
+                self._by_key[key] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            self._cond.notify_all()
+            return job.future
+
+    def pending(self, key):
+        """
+        Future of the queued or running job for `key`, if any.
+        """
+        with self._cond:
+            job = self._by_key.get(key)
+            return job.future if job else None
+
+    def promote(self, key, priority: int = INTERACTIVE, deadline=None):
+        """
+        Future of the job for `key` (None if there is none), after raising it to
+        `priority`. Used when a request is about to wait for queued speculative
+        work: left at SPECULATIVE it could not start while that request is in flight.
+        A speculative job takes the first waiter's `deadline` (a job only queued for
+        someone else's benefit needn't outlive its waiters); later waiters can only
+        extend it. A job submitted without a deadline keeps none.
+        """
+        with self._cond:
+            job = self._by_key.get(key)
+            if job is None:
+                return None
+            if not job.awaited:
+                job.awaited = True
+                job.deadline = deadline
+            elif job.deadline is not None and (deadline is None or job.deadline.expires_at < deadline.expires_at):
+                job.deadline = deadline
+            if job.priority > priority:
+                job.priority = priority
+                self._heap = [(job.priority if j is job else p, seq, j) for p, seq, j in self._heap]
+                heapq.heapify(self._heap)
+                self._cond.notify_all()
+            return job.future
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Stop starting jobs, drop queued ones, cancel speculative work and wait up to
+        `timeout` seconds for the rest to finish. True if everything finished.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._draining = True
+            for _, _, job in self._heap:
+                job.future.cancel()
+            self._heap.clear()
+            self._by_key = {k: j for k, j in self._by_key.items() if j in self._running}
+            for job in self._running:
+                if job.priority == SPECULATIVE:
+                    job.cancel_event.set()
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+            return True
+
+    def queued(self, priority=None) -> int:
+        with self._cond:
+            return sum(1 for p, _, _ in self._heap if priority is None or p == priority)
+
+    def _ensure_workers(self):
+        # Threads don't survive fork; start them per process on first use (under the
+        # lock, or two first submits in a fresh worker would each start a set)
+        with self._cond:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+                for t in self._threads:
+                    t.start()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._heap and not self._draining:
+                    priority = self._heap[0][0]
+                    if priority < SPECULATIVE or self._interactive == 0:
+                        _, _, job = heapq.heappop(self._heap)
+                        self._running.add(job)
+                        return job
+                self._cond.wait(timeout=1.0)
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    if job.deadline is not None and job.deadline.expired():
+                        metrics.inc("deadline_expired_queued")
+                        job.future.set_exception(DeadlineExceeded())
+                        continue
+                    try:
+                        job.future.set_result(job.fn(job))
+                    except BaseException as e:
+                        job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running.discard(job)
+                    if job.key is not None and self._by_key.get(job.key) is job:
+                        del self._by_key[job.key]
+                    self._cond.notify_all()
+
+
+class SpeculativeCache:
+    """
+    Results generated ahead of time, each served at most once.
+    Anything that expires or is evicted unserved is counted as wasted work.
+    """
+
+    def __init__(self, ttl: float = SPECULATIVE_TTL, max_entries: int = SPECULATIVE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._expire()
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.inc("speculative_wasted", reason="evicted")
+
+    def has(self, key) -> bool:
+        with self._lock:
+            self._expire()
+            return key in self._entries
+
+    def take(self, key):
+        with self._lock:
+            self._expire()
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._entries:
+            key, (created, _) = next(iter(self._entries.items()))
+            if now - created < self.ttl:
+                break
+            self._entries.popitem(last=False)
+            metrics.inc("speculative_wasted", reason="expired")
@@ -0,0 +1,104 @@
+"""
+Production entry point: runs the Flask app under gunicorn (prefork) instead of
+the Werkzeug dev server.
+
+    python serve.py --threads 8 --bind 0.0.0.0:5000
+
+One worker process by default. Chat sessions (with their Ollama context),
+batch jobs and parked speculative quizzes live in process memory, so with
+--workers > 1 a chat follow-up or batch resume that lands on another worker
+loses them (a fresh chat context, a 404); so does recycling via
+--max-requests. Workers share one socket and can't be targeted, so to scale
+out run several single-worker instances on their own ports behind a proxy
+with sticky sessions. Decks, notes and vectors live in shared files and work
+either way. Generation is mostly waiting on Ollama, so threads give most of
+the concurrency a worker needs.
+
+The app is imported once in the master (`preload`), so workers share imported
+modules copy-on-write. SIGHUP reloads workers gracefully; SIGTERM stops taking
+new connections, lets in-flight generations finish within --graceful-timeout,
+and drains queued background jobs before each worker exits.
+"""
+import argparse
+import os
+import sys
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn has no Windows support
+    BaseApplication = None
+
+
+def _post_fork(server, worker):
+    import app as smartprep
+    smartprep.after_fork()
+
+
+def _worker_exit(server, worker):
+    import app as smartprep
+    # Speculative jobs are cancelled; anything else gets the remaining grace period
+    smartprep.scheduler.drain(timeout=server.cfg.graceful_timeout)
+
+
+if BaseApplication is not None:
+    class SmartPrepServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import app
+            return app
+
+
+def build_options(args):
+    return {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        # gthread keeps a worker responsive while other threads wait on Ollama
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'preload_app': args.preload,
+        # Generations can legitimately take close to a minute
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+        'accesslog': '-' if args.access_log else None,
+        'post_fork': _post_fork,
+        'worker_exit': _worker_exit,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run SmartPrep AI with a production WSGI server")
+    parser.add_argument('--bind', default=os.getenv('SMARTPREP_BIND', '127.0.0.1:5000'))
+    parser.add_argument('--workers', type=int,
+                        default=int(os.getenv('SMARTPREP_WORKERS', '1')),
+                        help='chat sessions and batch jobs are per worker; see the module docstring before raising')
+    parser.add_argument('--threads', type=int, default=int(os.getenv('SMARTPREP_THREADS', '8')))
+    parser.add_argument('--no-preload', dest='preload', action='store_false')
+    parser.add_argument('--timeout', type=int, default=90)
+    parser.add_argument('--graceful-timeout', type=int, default=60)
+    parser.add_argument('--max-requests', type=int, default=0, help='recycle workers after N requests (0 = never)')
+    parser.add_argument('--access-log', action='store_true')
+    args = parser.parse_args(argv)
+
+    if BaseApplication is None:
+        sys.exit("serve.py needs gunicorn (pip install gunicorn; not available on Windows)")
+
+    if args.workers > 1:
+        print(f"⚠️  {args.workers} workers: chat sessions and batch jobs are per worker and are "
+              f"lost when a request lands on another one (see serve.py)")
+    print(f"🚀 SmartPrepAi serving on http://{args.bind} "
+          f"({args.workers} workers x {args.threads} threads)")
+    SmartPrepServer(build_options(args)).run()
+
+
+if __name__ == '__main__':
+    main()
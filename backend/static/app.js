@@ -7,6 +7,7 @@ document.addEventListener('DOMContentLoaded', function() {
     let isCardFlipped = false;
     let currentQuiz = null;
     let userQuizAnswers = [];
+    let chatSessionId = null;
     
     // Initialize the app
     initApp();
@@ -15,6 +16,7 @@ document.addEventListener('DOMContentLoaded', function() {
         setupEventListeners();
         setupTabNavigation();
         checkServerHealth();
+        openDeckFromUrl();
         
         // Make flashcards clickable to flip
         setupFlashcardClick();
@@ -52,6 +54,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Chat functionality
         document.getElementById('sendMessage').addEventListener('click', sendChatMessage);
+        document.getElementById('notesUpload').addEventListener('change', uploadNotes);
         document.getElementById('chatInput').addEventListener('keypress', function(e) {
             if (e.key === 'Enter' && !e.shiftKey) {
                 e.preventDefault();
@@ -93,6 +96,39 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Deck links: ?deck=<id> reopens a generated deck. GET /api/decks/<id> is
+    // cacheable, so reloads are served by the browser cache instead of the model.
+    function rememberDeck(deckId) {
+        if (deckId) {
+            history.replaceState(null, '', `?deck=${encodeURIComponent(deckId)}`);
+        }
+    }
+    
+    async function openDeckFromUrl() {
+        const deckId = new URLSearchParams(window.location.search).get('deck');
+        if (!deckId) return;
+        
+        try {
+            const response = await fetch(`/api/decks/${encodeURIComponent(deckId)}`);
+            const data = await response.json();
+            if (!data.success) return;
+            
+            document.querySelector(`.nav-btn[data-tab="${data.kind === 'quiz' ? 'quiz' : 'flashcards'}"]`).click();
+            if (data.kind === 'quiz') {
+                document.getElementById('quizTopic').value = data.topic;
+                currentQuiz = parseQuiz(data.quiz_text, data.topic);
+                currentQuiz.deckId = data.deck_id;
+                if (currentQuiz.questions.length > 0) displayQuiz();
+            } else {
+                document.getElementById('flashcardTopic').value = data.topic;
+                currentFlashcards = parseFlashcards(data.flashcards_text, data.topic);
+                displayFlashcards();
+            }
+        } catch (error) {
+            console.error('Error opening deck:', error);
+        }
+    }
+    
     // Flashcard Functions
     async function generateFlashcards() {
         const topicInput = document.getElementById('flashcardTopic');
@@ -124,10 +160,15 @@ document.addEventListener('DOMContentLoaded', function() {
             
             if (data.success) {
                 currentFlashcards = parseFlashcards(data.flashcards_text, topic);
+                rememberDeck(data.deck_id);
                 
                 if (currentFlashcards.length > 0) {
                     displayFlashcards();
-                    showNotification(`Generated ${currentFlashcards.length} flashcards about ${topic}`, 'success');
+                    showNotification(data.cached
+                        ? `The AI is unavailable; showing your last flashcards about ${topic}`
+                        : data.partial
+                        ? `Only ${currentFlashcards.length} flashcards about ${topic} were ready in time`
+                        : `Generated ${currentFlashcards.length} flashcards about ${topic}`, 'success');
                 } else {
                     showNotification('Could not parse flashcards from AI response. Try a different topic.', 'error');
                 }
@@ -146,6 +187,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function clearFlashcards() {
+        history.replaceState(null, '', window.location.pathname);
         currentFlashcards = [];
         currentCardIndex = 0;
         isCardFlipped = false;
@@ -254,10 +296,16 @@ document.addEventListener('DOMContentLoaded', function() {
             
             if (data.success) {
                 currentQuiz = parseQuiz(data.quiz_text, topic);
+                currentQuiz.deckId = data.deck_id;
+                rememberDeck(data.deck_id);
                 
                 if (currentQuiz.questions.length > 0) {
                     displayQuiz();
-                    showNotification(`Generated ${currentQuiz.questions.length} quiz questions about ${topic}`, 'success');
+                    showNotification(data.cached
+                        ? `The AI is unavailable; showing your last quiz about ${topic}`
+                        : data.partial
+                        ? `Only ${currentQuiz.questions.length} quiz questions about ${topic} were ready in time`
+                        : `Generated ${currentQuiz.questions.length} quiz questions about ${topic}`, 'success');
                 } else {
                     showNotification('Could not parse quiz questions from AI response. Try a different topic.', 'error');
                 }
@@ -276,6 +324,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function clearQuiz() {
+        history.replaceState(null, '', window.location.pathname);
         currentQuiz = null;
         userQuizAnswers = [];
         
@@ -416,6 +465,23 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById('quizResults').scrollIntoView({ behavior: 'smooth' });
         
         showNotification(`Quiz completed! Score: ${score}%`, 'success');
+        recordQuizAttempt(correctCount, currentQuiz.questions.length);
+    }
+    
+    function recordQuizAttempt(correctCount, total) {
+        // Progress logging is best effort; never block the results screen on it
+        fetch('/api/progress', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                topic: currentQuiz.topic,
+                deck_id: currentQuiz.deckId,
+                score: correctCount,
+                total: total
+            })
+        }).catch(error => console.error('Error recording quiz attempt:', error));
     }
     
     function resetQuiz() {
@@ -449,27 +515,84 @@ document.addEventListener('DOMContentLoaded', function() {
         chatInput.value = '';
         
         try {
-            const response = await fetch('/api/chat', {
+            // Server-Sent Events: the answer appears token by token, and closing
+            // the tab stops the generation on the server
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({ 
                     message: message,
-                    context: context
+                    context: context,
+                    session_id: chatSessionId
                 })
             });
             
+            if (!response.ok) {
+                const data = await response.json();
+                addChatMessage('ai', `Sorry, I encountered an error: ${data.error}`);
+                return;
+            }
+            
+            const messageText = addChatMessage('ai', '').querySelector('.message-text');
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            let answer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffered += decoder.decode(value, { stream: true });
+                const events = buffered.split('\n\n');
+                buffered = events.pop();
+                for (const raw of events) {
+                    const event = (raw.match(/^event: (.*)$/m) || [])[1] || 'message';
+                    const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+                    if (event === 'message') {
+                        answer += data.token;
+                        messageText.innerHTML = formatChatText(answer);
+                    } else if (event === 'done') {
+                        chatSessionId = data.session_id || chatSessionId;
+                        messageText.innerHTML = formatChatText(data.response);
+                    } else if (event === 'error') {
+                        messageText.innerHTML = formatChatText(`Sorry, I encountered an error: ${data.error}`);
+                    }
+                }
+                const chatMessages = document.getElementById('chatMessages');
+                chatMessages.scrollTop = chatMessages.scrollHeight;
+            }
+        } catch (error) {
+            console.error('Error sending chat message:', error);
+            addChatMessage('ai', 'Sorry, I encountered a network error. Please check if Ollama is running.');
+        }
+    }
+    
+    async function uploadNotes(e) {
+        const file = e.target.files[0];
+        if (!file) return;
+        
+        const formData = new FormData();
+        formData.append('file', file);
+        
+        try {
+            const response = await fetch('/api/notes', {
+                method: 'POST',
+                body: formData
+            });
+            
             const data = await response.json();
             
             if (data.success) {
-                addChatMessage('ai', data.response);
+                showNotification(`Added ${file.name} to your notes`, 'success');
             } else {
-                addChatMessage('ai', `Sorry, I encountered an error: ${data.error}`);
+                showNotification(data.error || 'Failed to upload notes', 'error');
             }
         } catch (error) {
-            console.error('Error sending chat message:', error);
-            addChatMessage('ai', 'Sorry, I encountered a network error. Please check if Ollama is running.');
+            console.error('Error uploading notes:', error);
+            showNotification('Network error while uploading notes.', 'error');
+        } finally {
+            e.target.value = '';
         }
     }
     
@@ -488,6 +611,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         chatMessages.appendChild(messageDiv);
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        return messageDiv;
     }
     
     function formatChatText(text) {
@@ -0,0 +1,180 @@
+import csv
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+
+from parsing import parse_flashcards, parse_quiz
+
+# Rows written per chunk when streaming an export
+EXPORT_BATCH_ROWS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decks_by_topic ON decks (kind, topic COLLATE NOCASE, created);
+CREATE TABLE IF NOT EXISTS cards (
+    deck_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    front TEXT NOT NULL,
+    back TEXT NOT NULL,
+    PRIMARY KEY (deck_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    deck_id TEXT,
+    topic TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def deck_id_for(kind: str, topic: str, text: str) -> str:
+    # Content-addressed: the same generated deck always gets the same ID
+    return hashlib.sha256(f"{kind}\0{topic}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def _deck_rows(kind: str, text: str):
+    if kind == 'quiz':
+        for q in parse_quiz(text):
+            options = " | ".join(f"{chr(65 + i)}) {o}" for i, o in enumerate(q['options']))
+            yield f"{q['question']} {options}", q['answer']
+    else:
+        yield from parse_flashcards(text)
+
+
+class Store:
+    """
+    SQLite store for generated decks and quiz attempts.
+    Exports read through their own connection and stream rows straight from
+    the cursor, so memory stays flat no matter how many rows there are.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = self._connect()
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def reopen(self):
+        """
+        Open a fresh connection, e.g. in a worker forked from a preloaded master.
+        The inherited handle is abandoned, not closed: SQLite handles must not cross fork().
+        """
+        self._db = self._connect()
+
+    def save_deck(self, kind: str, topic: str, text: str) -> str:
+        deck_id = deck_id_for(kind, topic, text)
+        with self._lock, self._db:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO decks (id, kind, topic, text, created) VALUES (?, ?, ?, ?, ?)",
+                (deck_id, kind, topic, text, time.time()),
+            ).rowcount
+            if inserted:
+                self._db.executemany(
+                    "INSERT INTO cards (deck_id, position, front, back) VALUES (?, ?, ?, ?)",
+                    [(deck_id, i, front, back) for i, (front, back) in enumerate(_deck_rows(kind, text))],
+                )
+        return deck_id
+
+    def get_deck(self, deck_id: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, topic, text, created FROM decks WHERE id = ?", (deck_id,)).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'topic': row[2], 'text': row[3], 'created': row[4]}
+
+    def latest_deck(self, kind: str, topic: str):
+        """
+        Most recent deck of `kind` for `topic` (case-insensitive), or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, topic, text, created FROM decks WHERE kind = ? AND topic = ? COLLATE NOCASE "
+                "ORDER BY created DESC LIMIT 1", (kind, topic)).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'topic': row[2], 'text': row[3], 'created': row[4]}
+
+    def record_attempt(self, topic: str, score: int, total: int, deck_id: str = None) -> int:
+        with self._lock, self._db:
+            return self._db.execute(
+                "INSERT INTO attempts (deck_id, topic, score, total, created) VALUES (?, ?, ?, ?, ?)",
+                (deck_id, topic, score, total, time.time()),
+            ).lastrowid
+
+    def iter_cards(self, kind: str = None, deck_id: str = None):
+        """
+        (topic, kind, front, back) rows in deck order, read lazily.
+        """
+        sql = "SELECT d.topic, d.kind, c.front, c.back FROM cards c JOIN decks d ON d.id = c.deck_id"
+        where, args = [], []
+        if kind:
+            where.append("d.kind = ?")
+            args.append(kind)
+        if deck_id:
+            where.append("d.id = ?")
+            args.append(deck_id)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY d.created, c.deck_id, c.position"
+        return self._iter_query(sql, args)
+
+    def iter_attempts(self):
+        return self._iter_query(
+            "SELECT id, deck_id, topic, score, total, created FROM attempts ORDER BY id", [])
+
+    def _iter_query(self, sql, args):
+        db = self._connect()
+        try:
+            yield from db.execute(sql, args)
+        finally:
+            db.close()
+
+
+def stream_delimited(header, rows, delimiter: str = ",", preamble: str = ""):
+    """
+    Encode rows as CSV/TSV, yielding one chunk per EXPORT_BATCH_ROWS rows.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter, lineterminator="\n")
+    buf.write(preamble)
+    if header:
+        writer.writerow(header)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_BATCH_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def anki_rows(cards):
+    # Front, Back, Tags: the topic becomes an Anki tag (no spaces allowed in tags)
+    for topic, kind, front, back in cards:
+        yield front, back, f"smartprep {kind} {'_'.join(topic.split())}"
+
+
+# Anki (2.1.55+) reads these headers, so the file imports without any mapping dialog
+ANKI_PREAMBLE = "#separator:tab\n#html:false\n#columns:Front\tBack\tTags\n#tags column:3\n"
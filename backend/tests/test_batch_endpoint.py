@@ -0,0 +1,94 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from mock_ollama import start_mock_server
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    server, url = start_mock_server(prompt_eval_ms=0, eval_ms=0.1)
+    yield server, url
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def smartprep(upstream):
+    os.environ.setdefault("SMARTPREP_DATA_DIR", tempfile.mkdtemp())
+    import app
+    app.pool.set_hosts([upstream[1]])
+    return app
+
+
+def run_batch(client, topics, kinds):
+    response = client.post("/api/batch/generate", json={"topics": topics, "kinds": kinds})
+    return [json.loads(line) for line in response.get_data().splitlines()]
+
+
+def test_streams_one_line_per_item_then_a_summary(smartprep):
+    client = smartprep.app.test_client()
+    lines = run_batch(client, ["Osmosis", "osmosis ", "Mitosis"], ["flashcards", "quiz"])
+    header, results, summary = lines[0], lines[1:-1], lines[-1]
+    assert header["total"] == 4  # the repeated topic counts once
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    assert all(r["success"] and r["deck_id"] for r in results)
+    assert summary == {"done": True, "job_id": header["job_id"], "succeeded": 4, "failed": 0}
+
+    again = run_batch(client, ["Osmosis"], ["quiz"])[1]
+    assert again["cached"] and again["quiz_text"]
+
+    resumed = client.get(f"/api/batch/{header['job_id']}?offset=3").get_data().splitlines()
+    assert len(resumed) == 3 and json.loads(resumed[1])["index"] in range(4)
+    assert client.get("/api/batch/unknown").status_code == 404
+
+
+def test_rejects_bad_input(smartprep):
+    client = smartprep.app.test_client()
+    assert client.post("/api/batch/generate", json={"topics": "cells"}).status_code == 400
+    assert client.post("/api/batch/generate", json={"topics": ["cells"], "kinds": ["essay"]}).status_code == 400
+    assert client.post("/api/batch/generate", json={"topics": [" "]}).status_code == 400
+
+
+def test_claimed_speculative_quiz_is_not_served_again(smartprep):
+    import metrics
+    topic = "Plate tectonics"
+    key = ("quiz", smartprep.normalize_topic(topic))
+    client = smartprep.app.test_client()
+    hits = metrics.get("speculative_hits")
+    # Held back by an interactive request, the speculative quiz is still queued when the batch claims it
+    with smartprep.scheduler.interactive():
+        smartprep.speculate_quiz(topic)
+        assert smartprep.scheduler.pending(key) is not None
+        [result] = run_batch(client, [topic], ["quiz"])[1:-1]
+    assert result["success"] and not result.get("cached")
+    assert not smartprep.speculative.has(key)
+    assert metrics.get("speculative_hits") == hits
+
+
+def test_quiz_request_shares_a_queued_batch_item(smartprep, upstream):
+    topic = "Volcanoes"
+    key = ("quiz", smartprep.normalize_topic(topic))
+    # Keep the batch item queued behind a job holding the scheduler's worker
+    release, started = threading.Event(), threading.Event()
+    smartprep.scheduler.submit(lambda j: (started.set(), release.wait(5)), smartprep.BATCH)
+    started.wait(5)
+    batch = []
+    batch_thread = threading.Thread(
+        target=lambda: batch.extend(run_batch(smartprep.app.test_client(), [topic], ["quiz"])))
+    batch_thread.start()
+    while smartprep.scheduler.pending(key) is None:
+        time.sleep(0.01)
+
+    generated = upstream[0].stats["generate"]
+    threading.Timer(0.1, release.set).start()
+    response = smartprep.app.test_client().post("/api/generate_quiz", json={"topic": topic},
+                                                 headers={"X-Deadline-Ms": "5000"})
+    batch_thread.join(5)
+    assert response.status_code == 200 and response.get_json()["quiz_text"]
+    [result] = batch[1:-1]
+    assert result["success"] and result["quiz_text"] == response.get_json()["quiz_text"]
+    assert upstream[0].stats["generate"] == generated + 1
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from batch_jobs import BatchJob, BatchJobStore
+
+
+def test_follow_streams_results_as_they_arrive():
+    job = BatchJob("j", [("quiz", "a"), ("quiz", "b")])
+    seen = []
+    reader = threading.Thread(target=lambda: seen.extend(job.follow()))
+    reader.start()
+    job.add_result({"index": 1})
+    time.sleep(0.05)
+    assert reader.is_alive()
+    job.add_result({"index": 0})
+    reader.join(2)
+    assert seen == [{"index": 1}, {"index": 0}] and job.done()
+
+
+def test_follow_resumes_from_an_offset():
+    job = BatchJob("j", [("quiz", "a"), ("quiz", "b"), ("quiz", "c")])
+    for i in range(3):
+        job.add_result({"index": i})
+    assert [r["index"] for r in job.follow(2)] == [2]
+    assert list(job.follow(3)) == []
+
+
+def test_store_expires_finished_jobs_only():
+    store = BatchJobStore(ttl=-1, max_jobs=10)
+    running = store.create([("quiz", "a")])
+    finished = store.create([("quiz", "b")])
+    finished.add_result({"index": 0})
+    assert store.get(finished.id) is None
+    assert store.get(running.id) is running
+
+
+def test_store_evicts_oldest_finished_jobs_past_its_cap():
+    store = BatchJobStore(ttl=3600, max_jobs=2)
+    jobs = [store.create([("quiz", str(i))]) for i in range(3)]
+    for job in jobs:
+        job.add_result({"index": 0})
+    store.create([("quiz", "new")])
+    assert store.get(jobs[0].id) is None and store.get(jobs[1].id) is None
+    assert store.get(jobs[2].id) is jobs[2]
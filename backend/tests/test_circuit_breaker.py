@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def call(breaker, ok=True, latency=0.01):
+    breaker.acquire()
+    breaker.record(ok, latency)
+
+
+def make(**kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, slow_seconds=1.0, open_seconds=0.05, close_after=2)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def test_opens_on_failure_rate_once_it_has_enough_calls():
+    breaker = make()
+    for _ in range(3):
+        call(breaker, ok=False)
+    assert breaker.state == CLOSED
+    call(breaker, ok=False)
+    assert breaker.state == OPEN and breaker.is_open()
+    with pytest.raises(CircuitOpenError) as caught:
+        breaker.acquire()
+    assert 0 < caught.value.retry_after <= 0.05
+
+
+def test_opens_on_slow_calls():
+    breaker = make()
+    for _ in range(4):
+        call(breaker, latency=2.0)
+    assert breaker.state == OPEN
+
+
+def test_tolerates_failures_below_the_rate():
+    breaker = make()
+    for ok in (True, False, True, True, False, True, True):
+        call(breaker, ok=ok)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probes_close_the_circuit():
+    breaker = make()
+    for _ in range(4):
+        call(breaker, ok=False)
+    time.sleep(0.06)
+    assert not breaker.is_open()
+    breaker.acquire()
+    assert breaker.state == HALF_OPEN
+    # One probe at a time until the first succeeds
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+    breaker.record(True, 0.01)
+    call(breaker)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_and_release_frees_the_slot():
+    breaker = make()
+    for _ in range(4):
+        call(breaker, ok=False)
+    time.sleep(0.06)
+    breaker.acquire()
+    breaker.release()
+    breaker.acquire()
+    breaker.record(False, 0.01)
+    assert breaker.state == OPEN
@@ -0,0 +1,55 @@
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from cors import CorsMiddleware, OriginPolicy
+
+
+def api(environ, start_response):
+    response = Response("{}", mimetype="application/json", headers={"Retry-After": "2", "Vary": "Accept-Encoding"})
+    return response(environ, start_response)
+
+
+def client():
+    return Client(CorsMiddleware(api, origins="https://app.example.edu,http://localhost:*"))
+
+
+def test_origin_policy_matches_exact_and_wildcard_entries():
+    policy = OriginPolicy("https://app.example.edu, https://*.school.org, http://localhost:*")
+    assert policy.allows("https://app.example.edu")
+    assert policy.allows("https://maths.school.org")
+    assert policy.allows("http://localhost:5173")
+    assert not policy.allows("https://evil.example.com")
+    assert not policy.allows("https://a.b.school.org.evil.com")
+
+
+def test_preflight_is_answered_without_the_app():
+    response = client().options("/api/chat", headers={
+        "Origin": "http://localhost:3000", "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "Content-Type, X-Deadline-Ms"})
+    assert response.status_code == 204
+    assert response.headers["Access-Control-Allow-Origin"] == "http://localhost:3000"
+    assert response.headers["Access-Control-Allow-Headers"] == "Content-Type, X-Deadline-Ms"
+
+
+def test_allowed_origin_can_read_retry_after_and_etag():
+    response = client().get("/api/decks/abc", headers={"Origin": "https://app.example.edu"})
+    assert response.headers["Access-Control-Allow-Origin"] == "https://app.example.edu"
+    exposed = [h.strip() for h in response.headers["Access-Control-Expose-Headers"].split(",")]
+    assert "Retry-After" in exposed and "ETag" in exposed
+    assert response.headers["Vary"] == "Accept-Encoding, Origin"
+
+
+def test_other_origins_and_paths_get_no_cors_headers():
+    response = client().get("/api/decks/abc", headers={"Origin": "https://evil.example.com"})
+    assert "Access-Control-Allow-Origin" not in response.headers
+    response = client().get("/", headers={"Origin": "https://app.example.edu"})
+    assert "Access-Control-Allow-Origin" not in response.headers
+
+
+def test_every_api_response_varies_by_origin():
+    for headers in ({}, {"Origin": "https://evil.example.com"}):
+        response = client().get("/api/decks/abc", headers=headers)
+        assert response.headers["Vary"] == "Accept-Encoding, Origin"
+    response = Client(CorsMiddleware(api, origins="*")).get("/api/decks/abc", headers={"Origin": "https://a.edu"})
+    assert response.headers["Access-Control-Allow-Origin"] == "*"
+    assert response.headers["Vary"] == "Accept-Encoding"
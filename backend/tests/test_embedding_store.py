@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore, hashed_embedding
+
+DIM = 16
+
+
+def unit(i):
+    vec = np.zeros(DIM, dtype=np.float32)
+    vec[i] = 1.0
+    return vec
+
+
+@pytest.fixture
+def prefix(tmp_path):
+    return str(tmp_path / "vectors")
+
+
+def test_search_returns_nearest_first(prefix):
+    store = EmbeddingStore(prefix, DIM)
+    store.append(["a", "b", "c"], [unit(0), unit(1), unit(0) + unit(1)])
+    hits = store.search(unit(0), k=2)
+    assert [i for i, _ in hits] == ["a", "c"]
+    assert hits[0][1] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_second_reader_sees_appends(prefix, dtype):
+    writer, reader = EmbeddingStore(prefix, DIM, dtype), EmbeddingStore(prefix, DIM)
+    writer.append(["a"], [unit(0)])
+    assert len(reader) == 1
+    writer.append(["b"], [unit(1)])
+    assert reader.search(unit(1), k=1)[0][0] == "b"
+    assert reader.dtype == np.dtype(dtype)
+
+
+def test_orphan_ids_from_a_crashed_writer_are_dropped(prefix):
+    store = EmbeddingStore(prefix, DIM)
+    store.append(["a", "b"], [unit(0), unit(1)])
+    # A writer died after writing its IDs but before its vectors
+    with open(prefix + ".ids", "a") as f:
+        f.write("c\nd\n")
+    reader = EmbeddingStore(prefix, DIM)
+    assert len(reader) == 2
+    store.append(["e"], [unit(4)])
+    assert store.search(unit(4), k=1)[0] == ("e", pytest.approx(1.0))
+    assert reader.search(unit(4), k=1)[0][0] == "e"
+    assert EmbeddingStore(prefix, DIM).search(unit(4), k=1)[0][0] == "e"
+
+
+def test_orphan_vectors_and_torn_rows_are_trimmed(prefix):
+    store = EmbeddingStore(prefix, DIM)
+    store.append(["a"], [unit(0)])
+    # A writer died after its vectors (one of them half written), before its IDs
+    with open(prefix + ".vec", "ab") as f:
+        f.write(unit(2).tobytes() + unit(3).tobytes()[:10])
+    assert len(store) == 1
+    store.append(["e"], [unit(4)])
+    assert len(store) == 2
+    assert store.search(unit(4), k=1)[0] == ("e", pytest.approx(1.0))
+
+
+def test_removed_rows_are_hidden_but_reused_ids_are_not(prefix):
+    store = EmbeddingStore(prefix, DIM)
+    reader = EmbeddingStore(prefix, DIM)
+    store.append(["1", "2", "3"], [unit(0), unit(0) * 0.9 + unit(1) * 0.1, unit(1)])
+    store.remove(["1"])
+    assert [i for i, _ in reader.search(unit(0), k=2)] == ["2", "3"]
+    assert "1" not in [i for i, _ in reader.search(unit(0), k=3)]
+
+    store.append(["1"], [unit(5)])
+    assert reader.search(unit(5), k=1)[0][0] == "1"
+
+
+def test_hashed_embedding_is_deterministic_and_normalised():
+    vec = hashed_embedding("Photosynthesis in the chloroplast", 64)
+    assert np.allclose(vec, hashed_embedding("photosynthesis in the CHLOROPLAST", 64))
+    assert np.linalg.norm(vec) == pytest.approx(1.0)
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+import hedging
+from hedging import HEDGE_MIN_DELAY, HEDGE_MIN_SAMPLES, HedgePolicy, hedged
+
+
+def warmed_policy(ttft=0.02, budget=1.0):
+    policy = HedgePolicy("test", budget=budget)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy.record_ttft(ttft)
+    return policy
+
+
+def test_no_delay_until_enough_samples():
+    policy = HedgePolicy("test")
+    for _ in range(HEDGE_MIN_SAMPLES - 1):
+        policy.record_ttft(1.0)
+    assert policy.delay() is None
+    policy.record_ttft(1.0)
+    assert policy.delay() == 1.0
+    assert warmed_policy(ttft=0.0).delay() == HEDGE_MIN_DELAY
+
+
+def test_credit_is_capped():
+    policy = HedgePolicy("test", budget=1.0)
+    for _ in range(10):
+        policy.earn()
+    assert sum(policy.spend() for _ in range(10)) == hedging.HEDGE_MAX_CREDIT
+
+
+def hosts(*delays):
+    """
+    launch() for hosts that stream their first chunk after the given delays.
+    """
+    cancelled = {}
+
+    def launch(exclude, on_host, should_stop):
+        host = next(h for h in range(len(delays)) if h not in exclude)
+        on_host(host)
+
+        def chunks():
+            time.sleep(delays[host])
+            for n in range(3):
+                if should_stop():
+                    cancelled[host] = True
+                    return
+                yield {"host": host, "n": n}
+                time.sleep(0.01)
+        return chunks()
+    return launch, cancelled
+
+
+def test_fast_first_host_is_not_hedged():
+    launch, _ = hosts(0.0, 0.0)
+    chunks = list(hedged(launch, warmed_policy(ttft=0.5)))
+    assert [c["host"] for c in chunks] == [0, 0, 0]
+
+
+def test_slow_host_is_hedged_and_cancelled():
+    launch, cancelled = hosts(1.0, 0.0)
+    policy = warmed_policy()
+    chunks = list(hedged(launch, policy))
+    assert [c["host"] for c in chunks] == [1, 1, 1]
+    deadline = time.monotonic() + 2
+    while 0 not in cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cancelled.get(0)
+
+
+def test_no_hedge_without_credit():
+    launch, _ = hosts(0.2, 0.0)
+    chunks = list(hedged(launch, warmed_policy(budget=0.0)))
+    assert [c["host"] for c in chunks] == [0, 0, 0]
+
+
+def test_first_failure_is_raised_not_hedged():
+    def launch(exclude, on_host, should_stop):
+        on_host(len(exclude))
+        raise ConnectionError("refused")
+    with pytest.raises(ConnectionError):
+        list(hedged(launch, warmed_policy(ttft=0.5)))
@@ -0,0 +1,76 @@
+import io
+
+import pytest
+
+from notes_index import NotesIndex, iter_chunks
+
+
+def upload(index, name, text):
+    return index.add_document(name, io.BytesIO(text.encode("utf-8")))
+
+
+def test_search_ranks_matching_chunk_first(tmp_path):
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    upload(index, "bio.md", "Photosynthesis turns light into chemical energy in the chloroplast.")
+    upload(index, "history.md", "The French Revolution began in 1789 with the storming of the Bastille.")
+
+    [(chunk_id, score)] = index.search("chloroplast light", k=1)
+    assert score > 0
+    assert "Photosynthesis" in index.chunk_texts([chunk_id])[0]
+
+
+def test_duplicate_upload_is_a_no_op(tmp_path):
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    first = upload(index, "bio.md", "Mitochondria make ATP.")
+    again = upload(index, "copy.md", "Mitochondria make ATP.")
+    assert again == {'id': first['id'], 'name': "copy.md", 'chunks': 0, 'duplicate': True}
+    assert len(index) == 1
+
+
+def test_removed_document_is_no_longer_found(tmp_path):
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    doc = upload(index, "bio.md", "Ribosomes build proteins.")
+    assert index.search("ribosomes")
+    assert index.remove_document(doc['id'])
+    assert index.search("ribosomes") == []
+    assert not index.remove_document(doc['id'])
+
+
+def test_sees_changes_made_by_another_worker(tmp_path):
+    # Two workers, one database: each keeps its own cached corpus stats
+    path = str(tmp_path / "notes.db")
+    first, second = NotesIndex(path), NotesIndex(path)
+    assert second.search("osmosis") == []
+
+    upload(first, "a.md", "Osmosis moves water across a membrane.")
+    assert [c for c, _ in second.search("osmosis")] == [c for c, _ in first.search("osmosis")]
+
+    doc = upload(first, "b.md", "Diffusion and osmosis are passive transport.")
+    assert len(second.search("osmosis")) == 2
+    first.remove_document(doc['id'])
+    assert len(second.search("osmosis")) == 1
+    assert len(second) == 1
+
+
+def test_chunks_overlap():
+    words = [f"w{i}" for i in range(250)]
+    chunks = list(iter_chunks([" ".join(words)], size=100, overlap=10))
+    assert [len(c.split()) for c in chunks] == [100, 100, 70]
+    assert chunks[1].split()[0] == "w90"
+
+
+def test_failed_upload_leaves_stats_unchanged(tmp_path):
+    index = NotesIndex(str(tmp_path / "notes.db"))
+    upload(index, "bio.md", "Ribosomes build proteins.")
+    total = index._total_length
+
+    class Broken(io.BytesIO):
+        # A file that breaks after its first chunk has been indexed
+        def __iter__(self):
+            yield b" ".join([b"word"] * 200)
+            raise OSError("read failed")
+
+    with pytest.raises(OSError):
+        index.add_document("broken.md", Broken(b"x"))
+    assert len(index) == 1 and index._total_length == total
+    assert [d['name'] for d in index.documents()] == ["bio.md"]
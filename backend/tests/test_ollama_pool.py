@@ -0,0 +1,77 @@
+import socket
+
+import pytest
+
+import metrics
+from circuit_breaker import CircuitOpenError
+from mock_ollama import start_mock_server
+from ollama_pool import OllamaPool
+from retry_budget import RetryBudget
+
+
+@pytest.fixture
+def mocks():
+    servers = [start_mock_server(prompt_eval_ms=0, eval_ms=0, embed_ms=0) for _ in range(2)]
+    yield servers
+    for server, _ in servers:
+        server.shutdown()
+
+
+def dead_url():
+    # A port nothing listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def generate(pool, **kwargs):
+    return "".join(chunk.get("response", "") for chunk in pool.stream_generate(
+        {"model": "phi3:mini", "prompt": "Explain osmosis"}, **kwargs))
+
+
+def test_generations_go_to_the_least_loaded_host(mocks):
+    pool = OllamaPool([url for _, url in mocks], affinity=False)
+    first = pool.stream_generate({"model": "phi3:mini", "prompt": "Explain osmosis"})
+    next(first)  # keeps its host busy
+    assert generate(pool)
+    first.close()
+    assert [server.stats["generate"] for server, _ in mocks] == [1, 1]
+    assert all(host.outstanding == 0 and host.outstanding_tokens == 0 for host in pool.hosts)
+
+
+def test_affinity_keeps_a_key_on_one_host(mocks):
+    pool = OllamaPool([url for _, url in mocks], affinity=True)
+    for _ in range(4):
+        generate(pool, affinity="session-1")
+    assert sorted(server.stats["generate"] for server, _ in mocks) == [0, 4]
+
+
+def test_embeddings_use_the_pool_hosts(mocks):
+    pool = OllamaPool([url for _, url in mocks])
+    vectors = pool.embed(["osmosis", "diffusion"])
+    assert len(vectors) == 2 and len(vectors[0]) > 0
+    assert sum(server.stats["embeddings"] for server, _ in mocks) == 1
+
+
+def test_refused_connection_is_retried_on_another_host(mocks):
+    server, url = mocks[0]
+    pool = OllamaPool([dead_url(), url], affinity=False)
+    # The budget starts empty; let every request earn a retry
+    pool.retry_budget = RetryBudget(ratio=1.0)
+    before = metrics.get("upstream_retries", route="embed", reason="connection")
+    for _ in range(3):
+        assert pool.embed(["osmosis"])
+        assert generate(pool)
+    assert server.stats["generate"] == 3 and server.stats["embeddings"] == 3
+    assert metrics.get("upstream_retries", route="embed", reason="connection") > before
+
+
+def test_no_usable_host_raises_circuit_open(mocks):
+    pool = OllamaPool([mocks[0][1]])
+    breaker = pool.hosts[0].breaker
+    for _ in range(breaker.min_calls):
+        breaker.acquire()
+        breaker.record(False, 0.0)
+    with pytest.raises(CircuitOpenError):
+        generate(pool)
+    assert not pool.available()
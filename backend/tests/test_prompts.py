@@ -0,0 +1,35 @@
+import pytest
+
+import prompts
+from prompts import PromptTemplate
+
+
+def test_render_fills_fields_and_adds_system():
+    template = PromptTemplate("demo", 1, "{notes}Topic: {topic}\n", system="Static instructions.")
+    assert template.render(topic="cells", notes="") == {"prompt": "Topic: cells\n", "system": "Static instructions."}
+
+
+def test_missing_values_are_an_error():
+    with pytest.raises(KeyError, match="topic"):
+        prompts.get_template("quiz").render(notes="")
+
+
+def test_latest_version_puts_variables_after_a_static_system_prompt():
+    first = prompts.render("flashcards", topic="osmosis", notes="")
+    second = prompts.render("flashcards", topic="the French Revolution", notes="")
+    assert first["system"] == second["system"]
+    assert first["prompt"].endswith("osmosis\n")
+
+
+def test_pinned_version_is_used(monkeypatch):
+    monkeypatch.setitem(prompts.PINNED_VERSIONS, "quiz", "1")
+    rendered = prompts.render("quiz", topic="osmosis", notes="")
+    assert "system" not in rendered
+    assert rendered["prompt"].startswith("\nMake 3 MCQ questions on osmosis.")
+
+
+def test_chat_followup_keeps_the_original_layout():
+    rendered = prompts.render("chat_followup", question="Why?", context=prompts.context_section("cells"))
+    assert rendered == {"prompt": "\nQuestion: Why?\nContext: cells\n"}
+    assert prompts.render("chat_followup", question="Why?", context=prompts.context_section(""))["prompt"] \
+        == "\nQuestion: Why?\n\n"
@@ -0,0 +1,44 @@
+from unittest import mock
+
+import requests
+
+from retry_budget import RETRY_MAX_DELAY, RetryBudget, backoff, transient_reason
+
+
+def test_budget_starts_empty_and_refills_by_ratio():
+    budget = RetryBudget(ratio=0.5, max_credit=2.0)
+    assert not budget.spend()
+    budget.earn()
+    assert not budget.spend()
+    budget.earn()
+    assert budget.spend()
+    assert not budget.spend()
+
+
+def test_credit_is_capped():
+    budget = RetryBudget(ratio=1.0, max_credit=2.0)
+    for _ in range(10):
+        budget.earn()
+    assert [budget.spend() for _ in range(3)] == [True, True, False]
+
+
+def test_zero_ratio_never_retries():
+    assert not RetryBudget(ratio=0.0).spend()
+
+
+def test_backoff_is_bounded():
+    assert all(0 <= backoff(retry) <= RETRY_MAX_DELAY for retry in range(12))
+
+
+def http_error(status):
+    return requests.HTTPError(response=mock.Mock(status_code=status))
+
+
+def test_transient_reasons():
+    assert transient_reason(http_error(503), 0.1, 10) == "busy"
+    assert transient_reason(http_error(500), 0.1, 10) is None
+    assert transient_reason(requests.exceptions.ConnectTimeout(), 10, 10) == "connect"
+    assert transient_reason(requests.exceptions.ConnectionError(), 0.1, 10) == "connection"
+    # A read timeout surfaces as a ConnectionError once the timeout has passed
+    assert transient_reason(requests.exceptions.ConnectionError(), 10, 10) is None
+    assert transient_reason(ValueError(), 0.1, 10) is None
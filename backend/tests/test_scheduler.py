@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+from scheduler import BATCH, INTERACTIVE, SPECULATIVE, GenerationScheduler, SpeculativeCache
+
+
+def blocker():
+    # A job that holds the only worker until released
+    release = threading.Event()
+    started = threading.Event()
+
+    def job(j):
+        started.set()
+        release.wait(5)
+        return "blocker"
+    return job, started, release
+
+
+def test_jobs_run_in_priority_order():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    scheduler.submit(job, BATCH)
+    started.wait(5)
+    order = []
+    futures = [scheduler.submit(lambda j, p=p: order.append(p), p) for p in (SPECULATIVE, BATCH, INTERACTIVE)]
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert order == [INTERACTIVE, BATCH, SPECULATIVE]
+
+
+def test_same_key_is_not_queued_twice():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    scheduler.submit(job, BATCH)
+    started.wait(5)
+    first = scheduler.submit(lambda j: 1, BATCH, key="k")
+    assert scheduler.submit(lambda j: 2, BATCH, key="k") is first
+    release.set()
+    assert first.result(timeout=5) == 1
+
+
+def test_speculative_work_waits_for_interactive_requests():
+    scheduler = GenerationScheduler(workers=1)
+    with scheduler.interactive():
+        future = scheduler.submit(lambda j: "done", SPECULATIVE, key="quiz")
+        time.sleep(0.1)
+        assert not future.done()
+    assert future.result(timeout=5) == "done"
+
+
+def test_promoted_job_runs_while_its_waiter_is_in_flight():
+    scheduler = GenerationScheduler(workers=1)
+    scheduler.submit(lambda j: "quiz", SPECULATIVE, key="quiz")
+    with scheduler.interactive(key="quiz"):
+        future = scheduler.promote("quiz")
+        assert future.result(timeout=2) == "quiz"
+    assert scheduler.promote("missing") is None
+
+
+def test_running_speculative_job_is_cancelled_by_other_interactive_work():
+    scheduler = GenerationScheduler(workers=1)
+    started = threading.Event()
+
+    def job(j):
+        started.set()
+        return j.cancel_event.wait(5)
+
+    future = scheduler.submit(job, SPECULATIVE, key="quiz")
+    started.wait(5)
+    with scheduler.interactive(key="chat"):
+        assert future.result(timeout=5) is True
+
+
+def test_job_expiring_in_the_queue_is_dropped():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    scheduler.submit(job, BATCH)
+    started.wait(5)
+    ran = []
+    future = scheduler.submit(lambda j: ran.append(1), BATCH, deadline=Deadline(0.05))
+    time.sleep(0.1)
+    release.set()
+    with pytest.raises(DeadlineExceeded):
+        future.result(timeout=5)
+    assert not ran
+
+
+def test_promote_gives_a_queued_job_the_waiters_deadline():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    scheduler.submit(job, BATCH)
+    started.wait(5)
+    timeouts = []
+    future = scheduler.submit(lambda j: timeouts.append(j.timeout(50)), SPECULATIVE, key="quiz")
+    scheduler.promote("quiz", deadline=Deadline(5))
+    release.set()
+    future.result(timeout=5)
+    assert 0 < timeouts[0] <= 5
+
+
+def test_promote_leaves_a_job_without_deadline_unbounded():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    scheduler.submit(job, BATCH)
+    started.wait(5)
+    ran = []
+    future = scheduler.submit(lambda j: ran.append(j.timeout(50)), BATCH, key="quiz")
+    scheduler.promote("quiz", deadline=Deadline(0.05))
+    time.sleep(0.1)
+    release.set()
+    future.result(timeout=5)
+    assert ran == [50]
+
+
+def test_later_waiters_extend_a_speculative_jobs_deadline():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    scheduler.submit(job, BATCH)
+    started.wait(5)
+    ran = []
+    future = scheduler.submit(lambda j: ran.append(j.timeout(50)), SPECULATIVE, key="quiz")
+    scheduler.promote("quiz", deadline=Deadline(0.05))
+    scheduler.promote("quiz", BATCH, deadline=None)
+    time.sleep(0.1)
+    release.set()
+    future.result(timeout=5)
+    assert ran == [50]
+
+
+def test_drain_cancels_queued_jobs():
+    scheduler = GenerationScheduler(workers=1)
+    job, started, release = blocker()
+    running = scheduler.submit(job, BATCH)
+    started.wait(5)
+    queued = scheduler.submit(lambda j: None, BATCH)
+    threading.Timer(0.1, release.set).start()
+    assert scheduler.drain(timeout=5)
+    assert queued.cancelled() and running.result() == "blocker"
+
+
+def test_speculative_cache_serves_each_entry_once():
+    cache = SpeculativeCache(ttl=60)
+    cache.put(("quiz", "cells"), "text")
+    assert cache.has(("quiz", "cells"))
+    assert cache.take(("quiz", "cells")) == "text"
+    assert cache.take(("quiz", "cells")) is None
+
+
+def test_concurrent_first_submits_start_one_worker_set(monkeypatch):
+    scheduler = GenerationScheduler(workers=2)
+    getpid = os.getpid
+    # Widen the gap between checking the pid and starting the workers
+    monkeypatch.setattr(os, "getpid", lambda: time.sleep(0.01) or getpid())
+    gate = threading.Barrier(8)
+
+    def first_submit():
+        gate.wait()
+        scheduler.submit(lambda j: None, BATCH).result(timeout=5)
+
+    threads = [threading.Thread(target=first_submit) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert len(scheduler._threads) == 2
+    assert sum(1 for t in threading.enumerate() if getattr(t, "_target", None) == scheduler._work) == 2